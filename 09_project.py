@@ -1,9 +1,30 @@
-from OpenGL.GL import *
-from OpenGL.GLUT import *
-from OpenGL.GLU import *
+import argparse
+import atexit
+import ctypes
+import json
 import math
+import os
 import random
+import sys
 import time
+from collections import deque
+try:
+    from OpenGL.GL import *
+    from OpenGL.GLUT import *
+    from OpenGL.GLU import *
+    HAS_OPENGL = True
+except ImportError:# Render-less build boxes: keep the GLUT input codes so the simulation still runs
+    HAS_OPENGL = False
+    GLUT_KEY_LEFT = 100
+    GLUT_KEY_UP = 101
+    GLUT_KEY_RIGHT = 102
+    GLUT_KEY_DOWN = 103
+    GLUT_LEFT_BUTTON = 0
+    GLUT_DOWN = 0
+try:
+    import numpy as np
+except ImportError:# NumPy is optional; the vectorized paths fall back to the per-object code
+    np = None
 
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 700
@@ -18,10 +39,66 @@ PLAYER_HEIGHT = 1.8
 PLAYER_WIDTH = 0.6
 PLAYER_HEIGHT_09 = PLAYER_HEIGHT * 0.9
 PLAYER_WIDTH_HALF = PLAYER_WIDTH / 2.0
+SIM_HZ = 60# All per-tick constants (speeds, cooldowns, lifetimes) are tuned for 60 ticks per second
+SIM_DT = 1.0 / SIM_HZ
+MAX_CATCH_UP_STEPS = 5
+TIMER_INTERVAL_MS = 16
+CAMERA_FOV = 75
+CAMERA_NEAR = 0.1
+CAMERA_FAR = 120.0
+MAX_BULLETS = 512
+BULLET_LIFETIME = 700
+TRAIL_LENGTH = 5
+ARENA_SIZE = 22
+MIN_ARENA_SIZE = 12
+MAX_ARENA_SIZE = 512
+CHUNK_SHIFT = 4# Tiles are stored, indexed, animated and drawn in 16x16 chunks
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK_SIZE - 1
+VIEW_DISTANCE = 48.0# Chunks further than this from the camera are not drawn; spawns stay this close to the player
+FLOW_RADIUS = 24# Hunters further than this many tiles from the player head straight for them
+WALL_WOBBLE = 0.15# Amplitude of the wall height animation
+DEFAULT_TUNING = {# Balance knobs; EnhancedGame(tuning=...) and --tuning override individual keys
+    'enemy_weights': {'hunter': 0.75, 'sniper': 0.25},# Relative spawn odds per enemy type
+    'enemy_base': 3,# Enemies kept alive: min(enemy_base + score // enemy_per_score, enemy_max)
+    'enemy_per_score': 25,
+    'enemy_max': 12,
+    'boss_every': 100,# A boss spawns whenever the score reaches a multiple of this
+    'victory_score': 300,
+    'power_up_ticks': {'speed': 500, 'shield': 800, 'rapid_fire': 300},
+}
+
+def merge_tuning(overrides=None, defaults=DEFAULT_TUNING, prefix=''):# DEFAULT_TUNING with overrides applied
+    # Nested dicts merge key by key, so {'power_up_ticks': {'speed': 600}} keeps the other durations.
+    # Unknown keys and values the game can't run with raise ValueError before any game starts
+    merged = {}
+    overrides = overrides or {}
+    unknown = set(overrides) - set(defaults)
+    if unknown:
+        raise ValueError(f"unknown tuning keys: {', '.join(prefix + key for key in sorted(unknown))}")
+    for key, default in defaults.items():
+        value = overrides.get(key, default)
+        if isinstance(default, dict):
+            if not isinstance(value, dict):
+                raise ValueError(f"tuning {prefix + key} must be an object")
+            merged[key] = merge_tuning(value if key in overrides else None, default, prefix + key + '.')
+        elif isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"tuning {prefix + key} must be a non-negative number, got {value!r}")
+        else:
+            merged[key] = value
+    if prefix:
+        return merged
+    for key in ('enemy_per_score', 'boss_every', 'victory_score'):# Divisors and the win condition
+        if merged[key] <= 0:
+            raise ValueError(f"tuning {key} must be positive, got {merged[key]!r}")
+    if sum(merged['enemy_weights'].values()) <= 0:
+        raise ValueError("tuning enemy_weights must give at least one enemy type a positive weight")
+    return merged
 
 # UTILITY CLASSES
 
 class Vector3:
+    __slots__ = ('x', 'y', 'z')
     def __init__(self, x=0, y=0, z=0):
         self.x, self.y, self.z = x, y, z
     def __add__(self, other):
@@ -39,81 +116,445 @@ class Vector3:
         return Vector3(0, 0, 0)
     def dot(self, other):
         return self.x * other.x + self.y * other.y + self.z * other.z
+    # In-place variants for the per-tick hot paths: they update this vector instead of allocating
+    def __iadd__(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+    def __isub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+    def __imul__(self, scalar):
+        self.x *= scalar
+        self.y *= scalar
+        self.z *= scalar
+        return self
+    def set(self, x, y, z):
+        self.x, self.y, self.z = x, y, z
+        return self
+    def normalize_ip(self):
+        length = self.length()
+        if length > 0:
+            self.x, self.y, self.z = self.x/length, self.y/length, self.z/length
+        else:
+            self.x, self.y, self.z = 0, 0, 0
+        return self
+    def distance_to(self, other):
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dz = self.z - other.z
+        return math.sqrt(dx*dx + dy*dy + dz*dz)
+class FixedTimestep:# Turns elapsed wall time into whole simulation steps of SIM_DT
+    def __init__(self, step=SIM_DT, max_steps=MAX_CATCH_UP_STEPS):
+        self.step = step
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.last_time = None
+        self.frames = 0
+        self.steps = 0
+        self.dropped_steps = 0# Steps discarded because a frame fell further behind than max_steps
+        self.merged_frames = 0# Frames that ran more than one step to catch up
+    def reset(self):
+        self.accumulator = 0.0
+        self.last_time = None
+    def advance(self, now=None):# Number of simulation steps to run for this frame
+        if now is None:
+            now = time.perf_counter()
+        if self.last_time is None:
+            self.last_time = now
+            return 0
+        self.accumulator += now - self.last_time
+        self.last_time = now
+        steps = int(self.accumulator / self.step)
+        self.accumulator -= steps * self.step
+        if steps > self.max_steps:
+            self.dropped_steps += steps - self.max_steps
+            steps = self.max_steps
+        if steps > 1:
+            self.merged_frames += 1
+        self.frames += 1
+        self.steps += steps
+        return steps
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'steps': self.steps,
+            'dropped_steps': self.dropped_steps,
+            'merged_frames': self.merged_frames,
+        }
+PROFILE_WINDOW = 120# Samples kept per phase for the rolling average and max
+class FrameProfiler:# Named phase timings: begin() starts the clock, each lap(name) charges the time since the last mark
+    def __init__(self, window=PROFILE_WINDOW):
+        self.enabled = False
+        self.window = window
+        self.samples = {}
+        self.last = 0.0
+    def reset(self):
+        self.samples = {}
+    def begin(self):
+        if self.enabled:
+            self.last = time.perf_counter()
+    def lap(self, name):# A single attribute test while disabled
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(now - self.last)
+        self.last = now
+    def stats(self):# {name: (average ms, max ms)} over the window, in first-recorded order
+        return {name: (sum(samples) * 1000 / len(samples), max(samples) * 1000)
+                for name, samples in self.samples.items()}
+class SpatialHash:# Uniform grid broadphase; 1-unit cells line up with the arena tiles
+    def __init__(self, cell_size=1.0):
+        self.cell_size = cell_size
+        self.cells = {}
+    def rebuild(self, objects):# Index active objects by cell, remembering their list order
+        self.cells.clear()
+        cell_size = self.cell_size
+        for index, obj in enumerate(objects):
+            if obj.active:
+                key = (math.floor(obj.position.x / cell_size), math.floor(obj.position.z / cell_size))
+                cell = self.cells.get(key)
+                if cell is None:
+                    self.cells[key] = [(index, obj)]
+                else:
+                    cell.append((index, obj))
+    def query(self, x, z, radius):# (index, object) pairs from every cell the query square touches
+        cell_size = self.cell_size
+        min_cx, max_cx = math.floor((x - radius) / cell_size), math.floor((x + radius) / cell_size)
+        min_cz, max_cz = math.floor((z - radius) / cell_size), math.floor((z + radius) / cell_size)
+        cells = self.cells
+        for cx in range(min_cx, max_cx + 1):
+            for cz in range(min_cz, max_cz + 1):
+                cell = cells.get((cx, cz))
+                if cell:
+                    yield from cell
+    def first_hit(self, position, radius):# Lowest-index active object within radius, like a linear scan
+        hit_index, hit = None, None
+        for index, obj in self.query(position.x, position.z, radius):
+            if (obj.active and (hit_index is None or index < hit_index) and
+                position.distance_to(obj.position) < radius):
+                hit_index, hit = index, obj
+        return hit
+class Frustum:# View volume of the active camera, from the same parameters as gluPerspective/gluLookAt
+    def __init__(self, eye, target, up, fov_y=CAMERA_FOV, aspect=None, near=CAMERA_NEAR, far=CAMERA_FAR):
+        if aspect is None:
+            aspect = WINDOW_WIDTH / WINDOW_HEIGHT
+        forward = (target - eye).normalize_ip()
+        side = Vector3(forward.y*up.z - forward.z*up.y, forward.z*up.x - forward.x*up.z,
+                       forward.x*up.y - forward.y*up.x).normalize_ip()
+        self.eye = eye
+        self.forward = forward
+        self.side = side
+        self.up = Vector3(side.y*forward.z - side.z*forward.y, side.z*forward.x - side.x*forward.z,
+                          side.x*forward.y - side.y*forward.x)
+        half_y = math.radians(fov_y) / 2
+        half_x = math.atan(math.tan(half_y) * aspect)
+        self.cos_x, self.sin_x = math.cos(half_x), math.sin(half_x)
+        self.cos_y, self.sin_y = math.cos(half_y), math.sin(half_y)
+        self.pixel_scale = WINDOW_HEIGHT / 2 / math.tan(half_y)# Screen pixels per world unit at depth 1
+        self.near = near
+        self.far = far
+    def sphere_visible(self, x, y, z, radius):# False only when the sphere is fully outside a plane
+        eye, forward, side, up = self.eye, self.forward, self.side, self.up
+        vx, vy, vz = x - eye.x, y - eye.y, z - eye.z
+        depth = vx*forward.x + vy*forward.y + vz*forward.z
+        if depth < self.near - radius or depth > self.far + radius:
+            return False
+        across = vx*side.x + vy*side.y + vz*side.z# abs() folds the left/right and top/bottom plane pairs
+        if abs(across) * self.cos_x - depth * self.sin_x > radius:
+            return False
+        above = vx*up.x + vy*up.y + vz*up.z
+        return abs(above) * self.cos_y - depth * self.sin_y <= radius
+    def spheres_visible(self, xs, ys, zs, radius):# NumPy version of sphere_visible over arrays of centres
+        eye, forward, side, up = self.eye, self.forward, self.side, self.up
+        vx, vy, vz = xs - eye.x, ys - eye.y, zs - eye.z
+        depth = vx*forward.x + vy*forward.y + vz*forward.z
+        across = vx*side.x + vy*side.y + vz*side.z
+        above = vx*up.x + vy*up.y + vz*up.z
+        return ((depth >= self.near - radius) & (depth <= self.far + radius) &
+                (np.abs(across) * self.cos_x - depth * self.sin_x <= radius) &
+                (np.abs(above) * self.cos_y - depth * self.sin_y <= radius))
+    def projected_radius(self, x, y, z, radius):# Approximate on-screen radius in pixels of a sphere at (x, y, z)
+        eye, forward = self.eye, self.forward
+        depth = (x - eye.x)*forward.x + (y - eye.y)*forward.y + (z - eye.z)*forward.z
+        return radius * self.pixel_scale / max(depth, self.near)
+    def box_visible(self, min_x, min_y, min_z, max_x, max_y, max_z):# AABB test via its bounding sphere
+        half_x, half_y, half_z = (max_x - min_x) / 2, (max_y - min_y) / 2, (max_z - min_z) / 2
+        return self.sphere_visible(min_x + half_x, min_y + half_y, min_z + half_z,
+                                   math.sqrt(half_x*half_x + half_y*half_y + half_z*half_z))
 class GameObject:
-    def __init__(self, position=Vector3(), size=1.0):
-        self.position = position
+    __slots__ = ('position', 'size', 'active')
+    def __init__(self, position=None, size=1.0):
+        self.position = position if position is not None else Vector3()
         self.size = size
         self.active = True
 
-        #Get bounding box for collision detection
+        #Get bounding box for collision detection as (min_x, max_x, min_z, max_z)
 
     def get_bounds(self):
-        return {
-            'min_x': self.position.x - self.size/2,
-            'max_x': self.position.x + self.size/2,
-            'min_z': self.position.z - self.size/2,
-            'max_z': self.position.z + self.size/2
-        }
+        half = self.size/2
+        return (self.position.x - half, self.position.x + half,
+                self.position.z - half, self.position.z + half)
+    def bounding_radius(self):# Sphere around position that encloses everything draw() emits
+        return self.size
     
 class EnhancedBullet(GameObject):
+    __slots__ = ('direction', 'speed', 'lifetime', 'is_player_bullet', 'arena')
     def __init__(self, position, direction, speed=0.5, is_player_bullet=True):
-        super().__init__(position, 0.15)
+        super().__init__(Vector3(), 0.15)
+        self.arena = None
+        self.reset(position, direction, speed, is_player_bullet)
+    def reset(self, position, direction, speed=0.5, is_player_bullet=True):# Re-arm a bullet taken from the pool
+        self.position.set(position.x, position.y, position.z)# Copied: update() moves it in place
         self.direction = direction.normalize()
         self.speed = speed
-        self.lifetime = 700
+        self.lifetime = BULLET_LIFETIME
         self.is_player_bullet = is_player_bullet
-        self.trail_positions = [Vector3(position.x, position.y, position.z) for _ in range(6)]
-        self.arena = None
+        self.active = True
 
     """Update enemy behavior based on type"""
 
     def update(self):
         if not self.active:
             return
-        prev_pos = Vector3(self.position.x, self.position.y, self.position.z)
-        new_pos = self.position + self.direction * self.speed
-        if abs(new_pos.x) > 9.8 or abs(new_pos.z) > 9.8:
+        position = self.position
+        direction = self.direction
+        new_x = position.x + direction.x * self.speed
+        new_z = position.z + direction.z * self.speed
+        limit = self.arena.bullet_limit if self.arena else ARENA_SIZE//2 - 1.2
+        if abs(new_x) > limit or abs(new_z) > limit:
             self.active = False
             return
-        if self.arena:
-            steps = max(int(self.speed * 10), 1)
-            for step in range(1, steps + 1):
-                t = step / steps
-                check_x = prev_pos.x + (new_pos.x - prev_pos.x) * t
-                check_z = prev_pos.z + (new_pos.z - prev_pos.z) * t
-                tile_type = self.arena.get_tile_at(check_x, check_z)
-                if tile_type == 1:
-                    self.active = False
-                    return
-        self.position = new_pos
-        self.trail_positions.pop()
-        self.trail_positions.insert(0, Vector3(self.position.x, self.position.y, self.position.z))
+        if self.arena and self.arena.segment_hit(position.x, position.z, new_x, new_z):# Exact, any speed
+            self.active = False
+            return
+        position.set(new_x, position.y + direction.y * self.speed, new_z)
         self.lifetime -= 1
         if self.lifetime <= 0:
             self.active = False
-    def draw(self):
+    def bounding_radius(self):
+        return self.size + self.speed * TRAIL_LENGTH
+    def draw(self, trail_length=TRAIL_LENGTH, frustum=None):
         if not self.active:
             return
-        for i in range(1, len(self.trail_positions)):
-            alpha = 1.0 - (i / len(self.trail_positions))
-            if self.is_player_bullet:
-                glColor3f(0.0 * alpha, 1.0 * alpha, 1.0 * alpha)
-            else:
-                glColor3f(1.0 * alpha, 0.2 * alpha, 0.0 * alpha)
-            glPushMatrix()
-            pos = self.trail_positions[i]
-            glTranslatef(pos.x, pos.y, pos.z)
-            glutSolidSphere(self.size * (1.0 - i * 0.12), 8, 8)
-            glPopMatrix()
-        glPushMatrix()
-        glTranslatef(self.position.x, self.position.y, self.position.z)
-        if self.is_player_bullet:
-            glColor3f(0.0, 0.8, 1.0)
+        step = self.direction * self.speed
+        draw_bullet(self.position.x, self.position.y, self.position.z, step.x, step.y, step.z,
+                    BULLET_LIFETIME - self.lifetime, self.size, self.is_player_bullet, trail_length, frustum)
+mesh_cache = {}# Display lists keyed by (primitive, parameters...), shared by every entity in the process
+def draw_cached_mesh(key, build, *args):# Compile build(*args) into a display list once, then replay it
+    display_list = mesh_cache.get(key)
+    if display_list is None:
+        display_list = glGenLists(1)
+        glNewList(display_list, GL_COMPILE)
+        build(*args)
+        glEndList()
+        mesh_cache[key] = display_list
+    glCallList(display_list)
+def draw_sphere(radius, slices, stacks):# Cached unit sphere scaled to radius, in place of glutSolidSphere
+    glPushMatrix()
+    glScalef(radius, radius, radius)
+    draw_cached_mesh(('sphere', slices, stacks), glutSolidSphere, 1.0, slices, stacks)
+    glPopMatrix()
+# Sphere tessellation per entity type as (min projected radius in pixels, slices, stacks), finest first.
+# A sphere of n slices deviates from a true circle by radius*(1 - cos(pi/n)), so each step down happens where
+# that is still about one pixel: 20 slices down to 52px, 16 to 29px, 12 to 13px, 8 to 7.5px, 6 to 3.4px.
+# Stacks only span half a turn, so the reduced levels use half as many for the same error
+LOD_THRESHOLDS = {
+    'hunter': ((52, 20, 20), (29, 16, 8), (13, 12, 6), (7.5, 8, 4), (3.4, 6, 3), (0, 4, 2)),
+    'boss': ((81, 25, 25), (52, 20, 10), (29, 16, 8), (13, 12, 6), (7.5, 8, 4), (0, 6, 3)),
+    'shield': ((52, 20, 20), (29, 16, 8), (13, 12, 6), (7.5, 8, 4), (3.4, 6, 3), (0, 4, 2)),
+    'head': ((29, 15, 15), (13, 12, 6), (7.5, 8, 4), (3.4, 6, 3), (0, 4, 2)),
+    'bullet': ((13, 10, 10), (7.5, 8, 4), (3.4, 6, 3), (0, 4, 2)),
+    'trail': ((7.5, 8, 8), (3.4, 6, 3), (0, 4, 2)),
+}
+def lod_level(kind, frustum, x, y, z, radius):# (slices, stacks) for a sphere of this type at this distance
+    levels = LOD_THRESHOLDS[kind]
+    if frustum is not None:
+        pixels = frustum.projected_radius(x, y, z, radius)
+        for min_pixels, slices, stacks in levels:
+            if pixels >= min_pixels:
+                return slices, stacks
+        return levels[-1][1:]
+    return levels[0][1:]# Full detail without a camera
+def draw_lod_sphere(kind, frustum, x, y, z, radius):# draw_sphere at the current origin, tessellated for world point (x, y, z)
+    slices, stacks = lod_level(kind, frustum, x, y, z, radius)
+    draw_sphere(radius, slices, stacks)
+def draw_bullet(x, y, z, dx, dy, dz, age, size, is_player_bullet, trail_length=TRAIL_LENGTH, frustum=None):
+    # Bullets fly straight at constant speed, so trail sphere i sits i ticks back along (dx, dy, dz),
+    # clamped to the spawn point for bullets younger than the trail
+    trail_slices, trail_stacks = lod_level('trail', frustum, x, y, z, size)# One level for the whole trail, it is only a few units long
+    for i in range(1, trail_length + 1):
+        alpha = 1.0 - (i / (trail_length + 1))
+        if is_player_bullet:
+            glColor3f(0.0 * alpha, 1.0 * alpha, 1.0 * alpha)
         else:
-            glColor3f(1.0, 0.0, 0.0)
-        glutSolidSphere(self.size, 10, 10)
+            glColor3f(1.0 * alpha, 0.2 * alpha, 0.0 * alpha)
+        back = min(i, age)
+        glPushMatrix()
+        glTranslatef(x - dx * back, y - dy * back, z - dz * back)
+        draw_sphere(size * (1.0 - i * 0.6 / trail_length), trail_slices, trail_stacks)
         glPopMatrix()
+    glPushMatrix()
+    glTranslatef(x, y, z)
+    if is_player_bullet:
+        glColor3f(0.0, 0.8, 1.0)
+    else:
+        glColor3f(1.0, 0.0, 0.0)
+    draw_lod_sphere('bullet', frustum, x, y, z, size)
+    glPopMatrix()
+class BulletPool:# Fixed-capacity set of EnhancedBullets recycled between shots
+    def __init__(self, capacity=MAX_BULLETS):
+        self.capacity = capacity
+        self.free = []
+        for _ in range(capacity):
+            bullet = EnhancedBullet(Vector3(), Vector3(0, 0, 1))
+            bullet.active = False
+            self.free.append(bullet)
+        self.in_use = 0
+        self.high_water = 0
+        self.rejected = 0# Shots dropped because the pool was exhausted
+    def acquire(self, position, direction, speed, is_player_bullet):
+        if not self.free:
+            self.rejected += 1
+            return None
+        bullet = self.free.pop()
+        bullet.reset(position, direction, speed, is_player_bullet)
+        self.in_use += 1
+        if self.in_use > self.high_water:
+            self.high_water = self.in_use
+        return bullet
+    def release(self, bullet):
+        bullet.active = False
+        self.free.append(bullet)
+        self.in_use -= 1
+    def collect(self, bullets):# Return spent bullets to the pool and keep the live ones
+        live = []
+        for bullet in bullets:
+            if bullet.active:
+                live.append(bullet)
+            else:
+                self.release(bullet)
+        return live
+    def stats(self):
+        return {
+            'capacity': self.capacity,
+            'in_use': self.in_use,
+            'high_water': self.high_water,
+            'rejected': self.rejected,
+        }
+class BulletArrays:# Structure-of-arrays bullet engine: every live bullet advances in one vectorized pass
+    def __init__(self, capacity=256, limit=MAX_BULLETS):
+        self.count = 0
+        self.high_water = 0
+        self.limit = limit# Same cap as the object path's BulletPool; add() refuses bullets beyond it
+        self.size = 0.15
+        self.trail_length = TRAIL_LENGTH
+        self.allocate(min(capacity, limit))
+    def allocate(self, capacity):
+        old_count = self.count
+        pos = np.zeros((capacity, 3))
+        direction = np.zeros((capacity, 3))
+        speed = np.zeros(capacity)
+        life = np.zeros(capacity, dtype=np.int32)
+        player = np.zeros(capacity, dtype=bool)
+        if old_count:
+            pos[:old_count] = self.pos[:old_count]
+            direction[:old_count] = self.direction[:old_count]
+            speed[:old_count] = self.speed[:old_count]
+            life[:old_count] = self.life[:old_count]
+            player[:old_count] = self.player[:old_count]
+        self.pos, self.direction, self.speed, self.life, self.player = pos, direction, speed, life, player
+    def clear(self):
+        self.count = 0
+    def __len__(self):
+        return self.count
+    def spawn(self, position, direction, speed, is_player_bullet):
+        if self.count == len(self.speed):
+            self.allocate(min(len(self.speed) * 2, self.limit))
+        i = self.count
+        self.pos[i] = (position.x, position.y, position.z)
+        self.direction[i] = (direction.x, direction.y, direction.z)
+        self.speed[i] = speed
+        self.life[i] = BULLET_LIFETIME
+        self.player[i] = is_player_bullet
+        self.count += 1
+        if self.count > self.high_water:
+            self.high_water = self.count
+    def full(self):
+        return self.count >= self.limit
+    def add(self, bullet):# Take over an EnhancedBullet returned by a shoot() call; False when full
+        if self.full():
+            return False
+        self.spawn(bullet.position, bullet.direction, bullet.speed, bullet.is_player_bullet)
+        return True
+    def keep(self, mask):# Compact the arrays down to the rows selected by mask
+        n = int(mask.sum())
+        if n != self.count:
+            self.pos[:n] = self.pos[:self.count][mask]
+            self.direction[:n] = self.direction[:self.count][mask]
+            self.speed[:n] = self.speed[:self.count][mask]
+            self.life[:n] = self.life[:self.count][mask]
+            self.player[:n] = self.player[:self.count][mask]
+            self.count = n
+    def step(self, arena):# Advance, bounds-check and wall-test every bullet at once
+        n = self.count
+        if n == 0:
+            return
+        pos = self.pos[:n]
+        speed = self.speed[:n]
+        new_pos = pos + self.direction[:n] * speed[:, None]
+        limit = arena.bullet_limit
+        alive = (np.abs(new_pos[:, 0]) <= limit) & (np.abs(new_pos[:, 2]) <= limit)
+        # Moving less than a tile per axis crosses at most three tiles: start, end and, when both axes
+        # change, the side tile the segment passes through first (both of them through an exact corner)
+        half = arena.half
+        start_x, start_z = pos[:, 0] + half, pos[:, 2] + half
+        dx, dz = new_pos[:, 0] - pos[:, 0], new_pos[:, 2] - pos[:, 2]
+        tile_x, tile_z = np.floor(start_x).astype(np.int64), np.floor(start_z).astype(np.int64)
+        end_x, end_z = np.floor(start_x + dx).astype(np.int64), np.floor(start_z + dz).astype(np.int64)
+        hit = arena.walls_at(tile_x, tile_z) | arena.walls_at(end_x, end_z)
+        diagonal = (tile_x != end_x) & (tile_z != end_z)
+        if diagonal.any():
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_x = (np.maximum(tile_x, end_x) - start_x) / dx
+                t_z = (np.maximum(tile_z, end_z) - start_z) / dz
+            hit |= diagonal & (t_x <= t_z) & arena.walls_at(end_x, tile_z)
+            hit |= diagonal & (t_z <= t_x) & arena.walls_at(tile_x, end_z)
+        for i in np.flatnonzero(alive & ((np.abs(dx) >= 1) | (np.abs(dz) >= 1))):# Rare fast bullets take the full walk
+            hit[i] = arena.segment_hit(pos[i, 0], pos[i, 2], new_pos[i, 0], new_pos[i, 2]) is not None
+        alive &= ~hit
+        pos[alive] = new_pos[alive]
+        self.life[:n] -= 1
+        alive &= self.life[:n] > 0
+        self.keep(alive)
+    def hits(self, center, radius, player_bullets):# Indices of bullets of one side within radius of center
+        n = self.count
+        if n == 0:
+            return np.zeros(0, dtype=np.int64)
+        offset = self.pos[:n] - (center.x, center.y, center.z)
+        close = np.einsum('ij,ij->i', offset, offset) < radius * radius
+        return np.flatnonzero(close & (self.player[:n] == player_bullets))
+    def draw(self, frustum=None):# Returns (drawn, culled) bullet counts
+        rows = range(self.count)
+        if frustum and self.count:
+            pos = self.pos[:self.count]
+            radius = self.size + self.speed[:self.count] * self.trail_length
+            rows = np.flatnonzero(frustum.spheres_visible(pos[:, 0], pos[:, 1], pos[:, 2], radius))
+        for i in rows:
+            x, y, z = self.pos[i]
+            dx, dy, dz = self.direction[i] * self.speed[i]
+            draw_bullet(x, y, z, dx, dy, dz, BULLET_LIFETIME - self.life[i], self.size,
+                        self.player[i], self.trail_length, frustum)
+        return len(rows), self.count - len(rows)
 class Enemy(GameObject):
+    __slots__ = ('enemy_type', 'health', 'max_health', 'last_shot', 'shoot_cooldown',
+                 'rotation_y', 'alert_level', 'move_timer')
     def __init__(self, position, enemy_type="hunter"):
         super().__init__(position, 0.9)
         self.enemy_type = enemy_type
@@ -124,16 +565,19 @@ class Enemy(GameObject):
         self.rotation_y = 0
         self.alert_level = 0
         self.move_timer = 0
+    def bounding_radius(self):# Covers the boss pulse and the sniper's barrel
+        return self.size * 1.25
     def update(self, player_pos, arena):
         if not self.active:
             return
-        distance_to_player = (player_pos - self.position).length()
+        direction = player_pos - self.position
+        distance_to_player = direction.length()
+        direction.normalize_ip()
 
         # FEATURE enemy behavior based on type
 
         if self.enemy_type == "hunter":
             if distance_to_player > 1.8:
-                direction = (player_pos - self.position).normalize()
                 base_speed = 0.004
 
                 #alert level increase when player is close
@@ -141,35 +585,32 @@ class Enemy(GameObject):
                 if distance_to_player < 10:
                     self.alert_level = min(120, self.alert_level + 2)
                     base_speed *= (1 + self.alert_level * 0.008)
-                new_pos = self.position + direction * base_speed
-                if not self.check_collision(new_pos, arena):
-                    self.position = new_pos
+                direction = self.flow_direction(direction, arena)
+                if self.follow_flow(direction, base_speed, arena):
                     self.rotation_y = math.degrees(math.atan2(direction.x, direction.z))
         elif self.enemy_type == "sniper":
             self.last_shot += 1
-            direction = (player_pos - self.position).normalize()
             self.rotation_y = math.degrees(math.atan2(direction.x, direction.z))
 
             # Maintain distance from player
 
-            if distance_to_player < 5:
-                retreat_dir = (self.position - player_pos).normalize()
-                new_pos = self.position + retreat_dir * 0.002
+            if not arena.line_of_sight(self.position.x, self.position.z, player_pos.x, player_pos.z):
+                self.follow_flow(self.flow_direction(direction, arena), 0.003, arena)# Walk around the wall to get a shot
+            elif distance_to_player < 5:
+                new_pos = self.position - direction * 0.002
                 if not self.check_collision(new_pos, arena):
                     self.position = new_pos
 
             # Move slightly sideways to avoid being a static target
 
             elif distance_to_player > 12:
-                approach_dir = (player_pos - self.position).normalize()
-                new_pos = self.position + approach_dir * 0.003
+                new_pos = self.position + direction * 0.003
                 if not self.check_collision(new_pos, arena):
                     self.position = new_pos
 
         # Boss moves slowly and shoots frequently
 
         elif self.enemy_type == "boss":
-            direction = (player_pos - self.position).normalize()# Move towards towards player slowly
             self.rotation_y = math.degrees(math.atan2(direction.x, direction.z)) # Face player
             self.move_timer += 1 # Increment move timer
             if self.move_timer % 120 == 0:
@@ -179,17 +620,39 @@ class Enemy(GameObject):
                         self.position = new_pos
             self.last_shot += 1
 
+    def flow_direction(self, direction, arena):# Towards the next flow-field tile, or unchanged when there is none
+        waypoint = arena.flow_waypoint(self.position.x, self.position.z)
+        if waypoint is None:
+            return direction
+        return Vector3(waypoint[0] - self.position.x, 0, waypoint[1] - self.position.z).normalize_ip()
+    def follow_flow(self, direction, speed, arena):# Step along direction; returns False if it had to recentre instead
+        new_pos = self.position + direction * speed
+        limit = arena.enemy_limit
+        if (abs(new_pos.x) <= limit and abs(new_pos.z) <= limit and arena.is_open(new_pos.x, new_pos.z)) \
+                or not self.check_collision(new_pos, arena):
+            self.position = new_pos
+            return True
+        # Clipping a wall corner: slide back to the middle of the (free) current tile, from where
+        # every flow step to a neighbouring tile centre is clear
+        centre_x, centre_z = arena.tile_centre(self.position.x, self.position.z)
+        offset = Vector3(max(-limit, min(limit, centre_x)) - self.position.x, 0,
+                         max(-limit, min(limit, centre_z)) - self.position.z)
+        if offset.length() > speed:
+            offset.normalize_ip()
+            offset *= speed
+        self.position += offset
+        return False
     def check_collision(self, new_pos, arena):
-        if abs(new_pos.x) > 9.2 or abs(new_pos.z) > 9.2:
+        if abs(new_pos.x) > arena.enemy_limit or abs(new_pos.z) > arena.enemy_limit:
             return True
         size_half = self.size / 2
-        check_points = [
+        check_points = (
             (new_pos.x - size_half, new_pos.z - size_half),
             (new_pos.x - size_half, new_pos.z + size_half),
             (new_pos.x + size_half, new_pos.z - size_half),
             (new_pos.x + size_half, new_pos.z + size_half),
             (new_pos.x, new_pos.z)
-        ]
+        )
         for px, pz in check_points:
             tile_type = arena.get_tile_at(px, pz)
             if tile_type == 1:
@@ -197,16 +660,19 @@ class Enemy(GameObject):
         return False
     def can_shoot(self):
         return self.last_shot >= self.shoot_cooldown
-    def shoot(self, player_pos):
-        # Shoot towards player with some inaccuracy based on type
-        if self.can_shoot():
+    def shoot(self, player_pos, rng=random, pool=None, arena=None):
+        # Shoot towards player with some inaccuracy based on type, holding fire while a wall is in the way
+        if self.can_shoot() and (arena is None or
+                                 arena.line_of_sight(self.position.x, self.position.z, player_pos.x, player_pos.z)):
             self.last_shot = 0
-            direction = (player_pos - self.position).normalize()
+            direction = (player_pos - self.position).normalize_ip()
             spread = 0.08 if self.enemy_type == "sniper" else 0.15
-            direction.x += (random.random() - 0.5) * spread
-            direction.z += (random.random() - 0.5) * spread
-            direction = direction.normalize()
+            direction.x += (rng.random() - 0.5) * spread
+            direction.z += (rng.random() - 0.5) * spread
+            direction.normalize_ip()
             speed = 0.12 if self.enemy_type == "boss" else 0.08
+            if pool:
+                return pool.acquire(self.position + Vector3(0, 0.3, 0), direction, speed, False)
             return EnhancedBullet(self.position + Vector3(0, 0.3, 0), direction, speed, False)
         return None
     def take_damage(self):
@@ -243,27 +709,28 @@ class Enemy(GameObject):
             glVertex3f(x2, height/2, z2)
             glVertex3f(x1, height/2, z1)
         glEnd()
-    def draw(self):
+    def draw(self, frustum=None):
         if not self.active:
             return
+        x, y, z = self.position.x, self.position.y, self.position.z
         glPushMatrix()
-        glTranslatef(self.position.x, self.position.y, self.position.z)
+        glTranslatef(x, y, z)
         glRotatef(self.rotation_y, 0, 1, 0)
         if self.enemy_type == "hunter":# Hunter glows more intensely as alert level rises
             alert_factor = min(1.0, self.alert_level / 60.0)
             glColor3f(1.0, 1.0 - alert_factor * 0.7, 1.0 - alert_factor)
-            glutSolidSphere(self.size/2, 20, 20)
+            draw_lod_sphere('hunter', frustum, x, y, z, self.size/2)
         elif self.enemy_type == "sniper":# Sniper has a cube body with a cylinder neck
             glColor3f(0.9, 0.1, 0.9)
             glutSolidCube(self.size)
             glColor3f(0.2, 0.2, 0.2)
             glTranslatef(0, 0, self.size/2)
             glRotatef(90, 1, 0, 0)
-            self.draw_cylinder_manually(0.12, 1.0, 10)
+            draw_cached_mesh(('cylinder', 0.12, 1.0, 10), self.draw_cylinder_manually, 0.12, 1.0, 10)
         elif self.enemy_type == "boss":# Boss pulses in size
             pulse = 1.0 + 0.2 * math.sin(time.time() * 2.0)
             glColor3f(0.7, 0.0, 0.7)
-            glutSolidSphere(self.size * pulse, 25, 25)
+            draw_lod_sphere('boss', frustum, x, y, z, self.size * pulse)
             self.draw_health_bar()
         glPopMatrix()
     def draw_health_bar(self):
@@ -292,12 +759,15 @@ class Enemy(GameObject):
         glEnd()
         glPopMatrix()
 class Collectible(GameObject):# Crystals and Power Cores
+    __slots__ = ('item_type', 'rotation', 'bob_time', 'glow_time')
     def __init__(self, position, item_type="crystal"):
         super().__init__(position, 0.4)
         self.item_type = item_type
         self.rotation = 0
         self.bob_time = 0
         self.glow_time = 0
+    def bounding_radius(self):# Drawn up to 0.85 above position, outer shell scaled by 1.3
+        return self.size * 1.3 + 0.85
     def update(self):# Rotate and bob up/down
         self.rotation += 2.5
         self.bob_time += 0.12
@@ -313,7 +783,7 @@ class Collectible(GameObject):# Crystals and Power Cores
         glVertex3f(0, -1, 0); glVertex3f(-1, 0, -1); glVertex3f(1, 0, -1)
         glVertex3f(0, -1, 0); glVertex3f(-1, 0, 1); glVertex3f(-1, 0, -1)
         glEnd()
-    def draw(self):# Draw with glow and bobbing effect
+    def draw(self, frustum=None):# Draw with glow and bobbing effect
         if not self.active:
             return
         glPushMatrix()
@@ -327,18 +797,21 @@ class Collectible(GameObject):# Crystals and Power Cores
         elif self.item_type == "power_core":
             glColor3f(1.0 * glow_intensity, 0.8 * glow_intensity, 0.2 * glow_intensity)
         glScalef(self.size, self.size, self.size)
-        self.draw_octahedron_manually()
+        draw_cached_mesh(('octahedron',), self.draw_octahedron_manually)
         glColor3f(0.5 * glow_intensity, 1.0 * glow_intensity, 1.0 * glow_intensity)
         glScalef(1.3, 1.3, 1.3)
-        self.draw_octahedron_manually()
+        draw_cached_mesh(('octahedron',), self.draw_octahedron_manually)
         glPopMatrix()
 class PowerUp(GameObject):# Speed Boost, Shield, Rapid Fire
+    __slots__ = ('power_type', 'rotation', 'bob_time', 'pulse_time')
     def __init__(self, position, power_type):
         super().__init__(position, 0.5)
         self.power_type = power_type
         self.rotation = 0
         self.bob_time = 0
         self.pulse_time = 0
+    def bounding_radius(self):# Drawn up to 0.6 above position, outer torus reaches 1.2 * size
+        return self.size * 1.2 + 0.6
     def update(self):
         self.rotation += 1.8
         self.bob_time += 0.1
@@ -383,7 +856,7 @@ class PowerUp(GameObject):# Speed Boost, Shield, Rapid Fire
                         glVertex3f(x_next2, y_next2, z_next2)
                         glVertex3f(x2, y2, z2)
             glEnd()
-    def draw(self):# Draw with rotation, bobbing, and pulsing
+    def draw(self, frustum=None):# Draw with rotation, bobbing, and pulsing
         if not self.active:
             return
         glPushMatrix()
@@ -397,16 +870,22 @@ class PowerUp(GameObject):# Speed Boost, Shield, Rapid Fire
             glColor3f(0.0, 0.6 * pulse, 1.0)
         elif self.power_type == "rapid_fire":
             glColor3f(1.0 * pulse, 0.6, 0.0)
-        self.draw_torus_manually(self.size * 0.3, self.size * 0.7, 8, 16)
+        inner, outer = self.size * 0.3, self.size * 0.7
+        draw_cached_mesh(('torus', inner, outer, 8, 16), self.draw_torus_manually, inner, outer, 8, 16)
         if self.power_type == "speed":
             glColor3f(0.0 * pulse, 1.0 * pulse, 0.2 * pulse)
         elif self.power_type == "shield":
             glColor3f(0.0 * pulse, 0.6 * pulse, 1.0 * pulse)
         elif self.power_type == "rapid_fire":
             glColor3f(1.0 * pulse, 0.6 * pulse, 0.0 * pulse)
-        self.draw_torus_manually(self.size * 0.4, self.size * 0.8, 8, 16)
+        inner, outer = self.size * 0.4, self.size * 0.8
+        draw_cached_mesh(('torus', inner, outer, 8, 16), self.draw_torus_manually, inner, outer, 8, 16)
         glPopMatrix()
 class EnhancedPlayer(GameObject):
+    __slots__ = ('game', 'velocity', 'health', 'max_health', 'energy', 'max_energy', 'rotation_y',
+                 'acceleration', 'max_speed', 'ground_friction', 'air_friction', 'on_ground',
+                 'jump_velocity', 'speed_boost', 'shield_time', 'rapid_fire_time', 'damage_cooldown',
+                 'shots_fired', 'last_shot_time', 'shoot_cooldown', 'bbox_offsets')
     def __init__(self, game_ref):
         super().__init__(Vector3(0, 1.0, 0), 0.7)
         self.game = game_ref
@@ -429,35 +908,25 @@ class EnhancedPlayer(GameObject):
         self.shots_fired = 0
         self.last_shot_time = 0
         self.shoot_cooldown = 0
-        self.bbox_offsets = {
-            'min_x': -PLAYER_WIDTH_HALF,
-            'max_x': PLAYER_WIDTH_HALF,
-            'min_y': 0,
-            'max_y': PLAYER_HEIGHT,
-            'min_z': -PLAYER_WIDTH_HALF,
-            'max_z': PLAYER_WIDTH_HALF
-        }
-    def get_bounding_box(self):# Get world-space bounding box for collision detection
-        return {
-            'min_x': self.position.x + self.bbox_offsets['min_x'],
-            'max_x': self.position.x + self.bbox_offsets['max_x'],
-            'min_y': self.position.y + self.bbox_offsets['min_y'],
-            'max_y': self.position.y + self.bbox_offsets['max_y'],
-            'min_z': self.position.z + self.bbox_offsets['min_z'],
-            'max_z': self.position.z + self.bbox_offsets['max_z']
-        }
+        # (min_x, max_x, min_y, max_y, min_z, max_z) relative to the player's position
+        self.bbox_offsets = (-PLAYER_WIDTH_HALF, PLAYER_WIDTH_HALF, 0, PLAYER_HEIGHT,
+                             -PLAYER_WIDTH_HALF, PLAYER_WIDTH_HALF)
+    def get_bounding_box(self):# World-space (min_x, max_x, min_y, max_y, min_z, max_z) for collision detection
+        min_x, max_x, min_y, max_y, min_z, max_z = self.bbox_offsets
+        x, y, z = self.position.x, self.position.y, self.position.z
+        return (x + min_x, x + max_x, y + min_y, y + max_y, z + min_z, z + max_z)
     def check_collision(self, new_pos, arena):# Check collision at new position
-        if abs(new_pos.x) > 9.3 or abs(new_pos.z) > 9.3:
+        if abs(new_pos.x) > arena.player_limit or abs(new_pos.z) > arena.player_limit:
             return True
-        bbox = self.bbox_offsets
+        min_x, max_x, _, _, min_z, max_z = self.bbox_offsets
         
-        check_points = [
-            (new_pos.x + bbox['min_x'], new_pos.z + bbox['min_z']),
-            (new_pos.x + bbox['min_x'], new_pos.z + bbox['max_z']),
-            (new_pos.x + bbox['max_x'], new_pos.z + bbox['min_z']),
-            (new_pos.x + bbox['max_x'], new_pos.z + bbox['max_z']),
+        check_points = (
+            (new_pos.x + min_x, new_pos.z + min_z),
+            (new_pos.x + min_x, new_pos.z + max_z),
+            (new_pos.x + max_x, new_pos.z + min_z),
+            (new_pos.x + max_x, new_pos.z + max_z),
             (new_pos.x, new_pos.z)
-        ]
+        )
         # Check tiles at bounding box corners and center
         for px, pz in check_points:
             tile_type = arena.get_tile_at(px, pz)
@@ -492,8 +961,8 @@ class EnhancedPlayer(GameObject):
         friction = self.ground_friction if self.on_ground else self.air_friction
         self.velocity.x *= friction
         self.velocity.z *= friction
-        self.velocity = self.velocity + self.acceleration
-        self.acceleration = Vector3()
+        self.velocity += self.acceleration
+        self.acceleration.set(0, 0, 0)
         horizontal_speed = math.sqrt(self.velocity.x**2 + self.velocity.z**2)
         current_max_speed = self.max_speed
         if self.speed_boost > 0:
@@ -503,11 +972,12 @@ class EnhancedPlayer(GameObject):
             self.velocity.x *= scale
             self.velocity.z *= scale
         new_pos = self.position + self.velocity
-        if abs(new_pos.x) > 9.3:
-            new_pos.x = 9.3 if new_pos.x > 0 else -9.3
+        limit = arena.player_limit
+        if abs(new_pos.x) > limit:
+            new_pos.x = limit if new_pos.x > 0 else -limit
             self.velocity.x = 0
-        if abs(new_pos.z) > 9.3:
-            new_pos.z = 9.3 if new_pos.z > 0 else -9.3
+        if abs(new_pos.z) > limit:
+            new_pos.z = limit if new_pos.z > 0 else -limit
             self.velocity.z = 0
         if not self.check_collision(new_pos, arena):
             self.position = new_pos
@@ -543,8 +1013,8 @@ class EnhancedPlayer(GameObject):
         right = Vector3(math.cos(camera_yaw), 0, -math.sin(camera_yaw))
         move_vector = forward * input_dir.z + right * input_dir.x
         if move_vector.length() > 0:
-            move_vector = move_vector.normalize()
-            self.acceleration = self.acceleration + move_vector * base_speed
+            move_vector.normalize_ip()
+            self.acceleration += move_vector * base_speed
             if move_vector.length() > 0.1:
                 self.rotation_y = math.degrees(math.atan2(move_vector.x, move_vector.z))
     def jump(self):# Jump if on ground and enough energy
@@ -560,12 +1030,13 @@ class EnhancedPlayer(GameObject):
     def use_power_up(self, power_type):# Activate power-up if enough energy
         if self.energy >= 25:
             self.energy -= 25
+            ticks = self.game.tuning['power_up_ticks']
             if power_type == "speed":
-                self.speed_boost = 500
+                self.speed_boost = ticks['speed']
             elif power_type == "shield":
-                self.shield_time = 800
+                self.shield_time = ticks['shield']
             elif power_type == "rapid_fire":
-                self.rapid_fire_time = 300
+                self.rapid_fire_time = ticks['rapid_fire']
     def get_aim_direction(self):# Get shooting direction based on camera or player orientation
         if self.game.camera_mode == 0:# First-person mode
             cos_y = math.cos(math.radians(self.game.camera_angle_y))
@@ -581,14 +1052,18 @@ class EnhancedPlayer(GameObject):
         cooldown_time = 4 if self.rapid_fire_time > 0 else 10
         if self.shoot_cooldown > 0:
             return []
+        if not self.game.bullet_room():# Rejected before any RNG draw, so a saturated cap can't skew the game's RNG
+            self.game.bullet_pool.rejected += 1
+            return []
         current_time = time.time()
         if current_time - self.last_shot_time > 1.2:
             self.shots_fired = 0
         spread = 0.02
         base_direction = self.get_aim_direction()
-        spread_x = (random.random() - 0.5) * spread
-        spread_y = (random.random() - 0.5) * spread * 0.6
-        spread_z = (random.random() - 0.5) * spread
+        rng = self.game.rng
+        spread_x = (rng.random() - 0.5) * spread
+        spread_y = (rng.random() - 0.5) * spread * 0.6
+        spread_z = (rng.random() - 0.5) * spread
         final_direction = Vector3(
             base_direction.x + spread_x,
             base_direction.y + spread_y,
@@ -596,7 +1071,9 @@ class EnhancedPlayer(GameObject):
         ).normalize()
         gun_barrel_offset = base_direction * 0.8
         start_position = self.position + Vector3(0, 0.4, 0) + gun_barrel_offset
-        bullet = EnhancedBullet(start_position, final_direction, 0.5, True)
+        bullet = self.game.bullet_pool.acquire(start_position, final_direction, 0.5, True)
+        if bullet is None:
+            return []
         self.shots_fired += 1
         self.last_shot_time = current_time
         self.shoot_cooldown = cooldown_time
@@ -630,14 +1107,15 @@ class EnhancedPlayer(GameObject):
             glVertex3f(x2, height/2, z2)
             glVertex3f(x1, height/2, z1)
         glEnd()
-    def draw(self):# Draw player with effects based on state
+    def draw(self, frustum=None):# Draw player with effects based on state
+        x, y, z = self.position.x, self.position.y, self.position.z
         glPushMatrix()
-        glTranslatef(self.position.x, self.position.y, self.position.z)
+        glTranslatef(x, y, z)
         glRotatef(self.rotation_y, 0, 1, 0)
         if self.shield_time > 0:
             pulse = 1.0 + 0.3 * math.sin(time.time() * 5)
             glColor3f(0.0, 0.4 * pulse, 1.0 * pulse)
-            glutSolidSphere(self.size * pulse, 20, 20)
+            draw_lod_sphere('shield', frustum, x, y, z, self.size * pulse)
         if self.damage_cooldown > 0:
             flash = 1.0 - (self.damage_cooldown / 80.0)
             glColor3f(1.0, flash, flash)
@@ -650,112 +1128,799 @@ class EnhancedPlayer(GameObject):
         glutSolidCube(self.size * 0.7)
         glColor3f(0.0, 0.9, 0.0)
         glTranslatef(0, self.size * 0.4, 0)
-        glutSolidSphere(self.size * 0.3, 15, 15)
+        draw_lod_sphere('head', frustum, x, y + self.size * 0.4, z, self.size * 0.3)
         glTranslatef(0, -self.size * 0.5, self.size * 0.4)
         glRotatef(90, 1, 0, 0)
         glColor3f(0.2, 0.2, 0.2)
-        self.draw_cylinder_manually(self.size * 0.1, self.size * 0.6, 12)
+        radius, height = self.size * 0.1, self.size * 0.6
+        draw_cached_mesh(('cylinder', radius, height, 12), self.draw_cylinder_manually, radius, height, 12)
         glPopMatrix()
+TILE_VERTEX_SHADER = """
+#version 120
+attribute vec3 position;
+attribute vec4 instance;
+uniform float wobble_phase;
+uniform float lava_phase;
+varying vec3 color;
+void main() {
+    float x = instance.x;
+    float z = instance.y;
+    float height = instance.z;
+    float state = instance.w;
+    if (state > 0.5 && state < 1.5) {
+        height += WALL_WOBBLE * sin(wobble_phase + x + z);
+    }
+    vec3 scale = vec3(1.0, max(height, 0.1), 1.0);
+    float lava = 0.9 + 0.3 * sin(lava_phase + x + z);
+    if (state > 2.5) {
+        scale = vec3(1.2, max(height, 0.1) + 0.3, 1.2);
+        color = vec3(lava, 0.6, 0.0);
+    } else if (state > 1.5) {
+        color = vec3(1.0, lava * 0.4, 0.0);
+    } else if (state > 0.5) {
+        color = vec3(0.3, 0.3, 0.7);
+    } else {
+        color = mod(x + z, 2.0) < 0.5 ? vec3(0.8) : vec3(0.6);
+    }
+    gl_Position = gl_ModelViewProjectionMatrix * vec4(position * scale + vec3(x, height / 2.0, z), 1.0);
+}
+"""
+TILE_FRAGMENT_SHADER = """
+#version 120
+varying vec3 color;
+void main() {
+    gl_FragColor = vec4(color, 1.0);
+}
+"""
+def unit_cube_triangles():# 36 vertices of a cube spanning -0.5..0.5, matching glutSolidCube(1)
+    corners = [(x, y, z) for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)]
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    vertices = []
+    for a, b, c, d in faces:
+        for index in (a, b, c, a, c, d):
+            vertices.extend(corners[index])
+    return vertices
+class TileInstancer:# Whole tile grid as instanced unit cubes with per-tile (x, z, base height, state); the
+    # instances are uploaded once per grid change and wall wobble and lava pulse are animated in the shader
+    LAVA_OVERLAY = 3# Extra instance for the enlarged cube drawn over each lava tile
+    def __init__(self, program):
+        self.program = program
+        self.position_location = glGetAttribLocation(program, "position")
+        self.instance_location = glGetAttribLocation(program, "instance")
+        self.wobble_phase_location = glGetUniformLocation(program, "wobble_phase")
+        self.lava_phase_location = glGetUniformLocation(program, "lava_phase")
+        self.cube_buffer = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.cube_buffer)
+        glBufferData(GL_ARRAY_BUFFER, np.array(unit_cube_triangles(), dtype=np.float32), GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.instance_buffer = glGenBuffers(1)
+        self.instances = None
+        self.chunk_starts = None
+        self.chunk_ends = None
+    @classmethod
+    def create(cls):# None when the context can't do shaders plus instanced arrays
+        if not HAS_OPENGL or np is None:
+            return None
+        try:
+            from OpenGL.GL import shaders
+            if not (bool(glDrawArraysInstanced) and bool(glVertexAttribDivisor)):
+                return None
+            program = shaders.compileProgram(
+                shaders.compileShader(TILE_VERTEX_SHADER.replace('WALL_WOBBLE', repr(WALL_WOBBLE)), GL_VERTEX_SHADER),
+                shaders.compileShader(TILE_FRAGMENT_SHADER, GL_FRAGMENT_SHADER))
+            return cls(program)
+        except Exception as error:
+            print(f"Instanced tile rendering unavailable, using display lists: {error}")
+            return None
+    def rebuild(self, arena):# One instance per tile plus lava overlays, grouped by chunk so chunks cull as slices
+        states = arena.tile_states
+        lava = arena.tile_order[states[arena.tile_order] == 2]
+        rows = np.concatenate([arena.tile_order, lava])
+        overlay = np.arange(rows.size) >= arena.tile_order.size
+        order = np.argsort(rows >> 2*CHUNK_SHIFT, kind='stable')
+        rows, overlay = rows[order], overlay[order]
+        chunk = rows >> 2*CHUNK_SHIFT
+        chunk_x, chunk_z = np.divmod(chunk, arena.chunks)
+        self.instances = np.zeros((rows.size, 4), dtype=np.float32)
+        self.instances[:, 0] = chunk_x * CHUNK_SIZE + ((rows >> CHUNK_SHIFT) & CHUNK_MASK) - arena.half
+        self.instances[:, 1] = chunk_z * CHUNK_SIZE + (rows & CHUNK_MASK) - arena.half
+        self.instances[:, 2] = arena.tile_heights[rows]
+        self.instances[:, 3] = np.where(overlay, self.LAVA_OVERLAY, states[rows])
+        every_chunk = np.arange(arena.chunks * arena.chunks)
+        self.chunk_starts = np.searchsorted(chunk, every_chunk).tolist()
+        self.chunk_ends = np.searchsorted(chunk, every_chunk, side='right').tolist()
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
+        glBufferData(GL_ARRAY_BUFFER, self.instances, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+    def visible_ranges(self, arena, frustum):# (first, count) instance runs of the visible chunks, adjacent runs merged
+        ranges = []
+        for chunk in arena.visible_chunks(frustum):
+            start, end = self.chunk_starts[chunk], self.chunk_ends[chunk]
+            if start == end:
+                continue
+            if ranges and ranges[-1][0] + ranges[-1][1] == start:
+                ranges[-1][1] += end - start
+            else:
+                ranges.append([start, end - start])
+        return ranges
+    def draw(self, arena, frustum=None):# Returns (drawn, culled) instance counts; culling is per chunk
+        ranges = self.visible_ranges(arena, frustum)
+        stride = self.instances.strides[0]
+        glUseProgram(self.program)
+        glUniform1f(self.wobble_phase_location, arena.wobble_phase() + 2 * arena.half)# Shader x, z are world, not tile, coordinates
+        glUniform1f(self.lava_phase_location, (time.time() * 3) % (2 * math.pi))
+        glBindBuffer(GL_ARRAY_BUFFER, self.cube_buffer)
+        glEnableVertexAttribArray(self.position_location)
+        glVertexAttribPointer(self.position_location, 3, GL_FLOAT, GL_FALSE, 0, None)
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_buffer)
+        glEnableVertexAttribArray(self.instance_location)
+        glVertexAttribDivisor(self.instance_location, 1)
+        for first, count in ranges:# The instance attribute offset selects each run inside the static buffer
+            glVertexAttribPointer(self.instance_location, 4, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(first * stride))
+            glDrawArraysInstanced(GL_TRIANGLES, 0, 36, count)
+        glVertexAttribDivisor(self.instance_location, 0)
+        glDisableVertexAttribArray(self.instance_location)
+        glDisableVertexAttribArray(self.position_location)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        glUseProgram(0)
+        drawn = sum(count for _, count in ranges)
+        return drawn, len(self.instances) - drawn
+FLOW_STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))# Orthogonal first so ties go straight
 class Arena:
-    def __init__(self):
-        self.size = 22
+    def __init__(self, rng=random, size=ARENA_SIZE):
+        if not MIN_ARENA_SIZE <= size <= MAX_ARENA_SIZE:
+            raise ValueError(f"arena size must be between {MIN_ARENA_SIZE} and {MAX_ARENA_SIZE}, got {size}")
+        self.rng = rng
+        self.size = size
+        self.half = size//2
+        # Movement limits keep each kind of object clear of the boundary walls; on the original 22-tile
+        # arena these are the old 9.3 (player), 9.2 (enemies) and 9.8 (bullets)
+        self.player_limit = self.half - 1.7
+        self.enemy_limit = self.half - 1.8
+        self.bullet_limit = self.half - 1.2
+        self.chunks = -(-size // CHUNK_SIZE)# Chunks per side; the last row and column may be partly outside the arena
         self.tile_states = []
         self.tile_heights = []
+        self.state_rows = []
+        self.chunk_animated = []
+        self.chunk_free = []
+        self.chunk_lists = [None] * (self.chunks * self.chunks)
+        self.chunk_dirty = [True] * (self.chunks * self.chunks)
+        self.near_key = None
+        self.near_chunks = []
+        self.static_dirty = True
+        self.use_instancing = True
+        self.instancer = None
+        self.version = 0# Bumped on every tile-state change so derived grids know to rebuild
+        self.flow_key = None
+        self.flow_next = None
+        self.open_tiles = []
+        self.los_cache = {}
+        self.los_version = None
         self.init_tiles()
     def init_tiles(self):
-        self.tile_states = []
-        self.tile_heights = []
-        for x in range(-self.size//2, self.size//2):
+        # tile_states/tile_heights hold every tile in chunk-major order (CHUNK_SIZE x CHUNK_SIZE blocks laid
+        # end to end, see tile_index), as NumPy arrays when NumPy is available and flat lists otherwise.
+        # state_rows mirrors tile_states as plain lists because single-tile lookups are faster on lists.
+        # Wall heights are static bases; the wobble on top is a function of time (see wobble_phase).
+        state_rows = []
+        height_rows = []
+        half = self.half# Tile i sits at world i - half for any size, as in tile_coords
+        for tile_x in range(self.size):
+            x = tile_x - half
             row_states = []
             row_heights = []
-            for z in range(-self.size//2, self.size//2):
+            for tile_z in range(self.size):
+                z = tile_z - half
                 state = 0
                 height = 0
                 if abs(x) < 4 and abs(z) < 4:
                     state = 0
                 else:
-                    rand = random.random()
+                    rand = self.rng.random()
                     if rand < 0.15:
                         state = 1
-                        height = random.uniform(1.5, 3.0)
+                        self.rng.uniform(1.5, 3.0)# Still drawn so seeded layouts stay the same
+                        height = 1.5 + (tile_x + tile_z) % 3 * 0.5
                     elif rand < 0.20:
                         state = 2
                 row_states.append(state)
                 row_heights.append(height)
-            self.tile_states.append(row_states)
-            self.tile_heights.append(row_heights)
-    def update(self):# Animate tile heights for elevated tiles
-        for x in range(len(self.tile_states)):
-            for z in range(len(self.tile_states[0])):
-                if self.tile_states[x][z] == 1:
-                    base_height = 1.5 + (x + z) % 3 * 0.5
-                    self.tile_heights[x][z] = base_height + math.sin(time.time() * 0.8 + x + z) * 0.15
+            state_rows.append(row_states)
+            height_rows.append(row_heights)
+        self.state_rows = state_rows
+        cells = self.chunks * self.chunks * CHUNK_SIZE * CHUNK_SIZE
+        if np is not None:
+            self.tile_order = self.tile_index(*np.indices((self.size, self.size))).ravel()
+            self.tile_states = np.zeros(cells, dtype=np.int8)
+            self.tile_states[self.tile_order] = np.array(state_rows, dtype=np.int8).ravel()
+            self.tile_heights = np.zeros(cells, dtype=np.float64)
+            self.tile_heights[self.tile_order] = np.array(height_rows, dtype=np.float64).ravel()
+        else:
+            self.tile_states = [0] * cells
+            self.tile_heights = [0.0] * cells
+            for x in range(self.size):
+                for z in range(self.size):
+                    index = self.tile_index(x, z)
+                    self.tile_states[index] = state_rows[x][z]
+                    self.tile_heights[index] = height_rows[x][z]
+        self.index_tiles()
+    def tile_index(self, tile_x, tile_z):# Offset of a tile (or NumPy arrays of tiles) in the chunk-major flat arrays
+        chunk = (tile_x >> CHUNK_SHIFT) * self.chunks + (tile_z >> CHUNK_SHIFT)
+        return (chunk << 2*CHUNK_SHIFT) | ((tile_x & CHUNK_MASK) << CHUNK_SHIFT) | (tile_z & CHUNK_MASK)
+    def chunk_tiles(self, chunk):# In-arena (tile_x, tile_z) of one chunk, in storage order
+        chunk_x, chunk_z = divmod(chunk, self.chunks)
+        x0, z0 = chunk_x * CHUNK_SIZE, chunk_z * CHUNK_SIZE
+        return [(x, z) for x in range(x0, min(x0 + CHUNK_SIZE, self.size))
+                for z in range(z0, min(z0 + CHUNK_SIZE, self.size))]
+    def index_chunk(self, chunk):# Rebuild one chunk's animated and free-tile lists
+        rows = self.state_rows
+        tiles = self.chunk_tiles(chunk)
+        self.chunk_animated[chunk] = [(x, z) for x, z in tiles if rows[x][z] != 0]
+        self.chunk_free[chunk] = [(x, z) for x, z in tiles if rows[x][z] == 0]
+        self.chunk_dirty[chunk] = True
+    def index_tiles(self):# Rebuild everything derived from state_rows after the grid changes
+        count = self.chunks * self.chunks
+        self.chunk_animated = [None] * count
+        self.chunk_free = [None] * count
+        for chunk in range(count):
+            self.index_chunk(chunk)
+        self.static_dirty = True# Baked geometry is rebuilt on the next draw
+        self.version += 1
+        if np is not None:# A tile is open when no wall (or the grid edge) is in its 3x3 neighbourhood
+            blocked = np.ones((self.size + 2, self.size + 2), dtype=bool)
+            blocked[1:-1, 1:-1] = np.array(self.state_rows, dtype=np.int8) == 1
+            near_wall = np.zeros((self.size, self.size), dtype=bool)
+            for dx in range(3):
+                for dz in range(3):
+                    near_wall |= blocked[dx:dx + self.size, dz:dz + self.size]
+            self.open_tiles = (~near_wall).tolist()
+        else:
+            self.open_tiles = [[self.tile_open(x, z) for z in range(self.size)] for x in range(self.size)]
+    def tile_open(self, tile_x, tile_z):
+        rows = self.state_rows
+        return all(0 <= tile_x + dx < self.size and 0 <= tile_z + dz < self.size and rows[tile_x + dx][tile_z + dz] != 1
+                   for dx in (-1, 0, 1) for dz in (-1, 0, 1))
+    def set_tile(self, tile_x, tile_z, state, height=0.0):# Change one tile, re-deriving only its chunk and neighbours
+        index = self.tile_index(tile_x, tile_z)
+        self.state_rows[tile_x][tile_z] = state
+        self.tile_states[index] = state
+        self.tile_heights[index] = height
+        self.index_chunk((tile_x >> CHUNK_SHIFT) * self.chunks + (tile_z >> CHUNK_SHIFT))
+        for x in range(max(tile_x - 1, 0), min(tile_x + 2, self.size)):
+            for z in range(max(tile_z - 1, 0), min(tile_z + 2, self.size)):
+                self.open_tiles[x][z] = self.tile_open(x, z)
+        self.static_dirty = True
+        self.version += 1
+    def chunks_in(self, min_x, max_x, min_z, max_z):# Chunk ids overlapping a world-space rectangle
+        last = self.size - 1
+        chunk_x0 = max(0, min(last, int(math.floor(min_x)) + self.half)) >> CHUNK_SHIFT
+        chunk_x1 = max(0, min(last, int(math.floor(max_x)) + self.half)) >> CHUNK_SHIFT
+        chunk_z0 = max(0, min(last, int(math.floor(min_z)) + self.half)) >> CHUNK_SHIFT
+        chunk_z1 = max(0, min(last, int(math.floor(max_z)) + self.half)) >> CHUNK_SHIFT
+        return [chunk_x * self.chunks + chunk_z for chunk_x in range(chunk_x0, chunk_x1 + 1)
+                for chunk_z in range(chunk_z0, chunk_z1 + 1)]
+    def chunks_near(self, world_x, world_z):# Chunks within VIEW_DISTANCE of a point; cached per chunk of the point
+        tile_x, tile_z = self.tile_coords(world_x, world_z)
+        key = (tile_x >> CHUNK_SHIFT, tile_z >> CHUNK_SHIFT)
+        if key != self.near_key:
+            self.near_key = key
+            self.near_chunks = self.chunks_in(world_x - VIEW_DISTANCE, world_x + VIEW_DISTANCE,
+                                              world_z - VIEW_DISTANCE, world_z + VIEW_DISTANCE)
+        return self.near_chunks
+    def chunk_visible(self, chunk, frustum):# Chunk box (with lava overlay margin and wall height) against the view
+        chunk_x, chunk_z = divmod(chunk, self.chunks)
+        min_x = chunk_x * CHUNK_SIZE - self.half - 0.6
+        min_z = chunk_z * CHUNK_SIZE - self.half - 0.6
+        return frustum.box_visible(min_x, 0, min_z, min_x + CHUNK_SIZE + 1.2, 3.5, min_z + CHUNK_SIZE + 1.2)
+    def visible_chunks(self, frustum):# Chunks to draw: near the camera and inside its frustum (all without one)
+        if frustum is None:
+            return range(self.chunks * self.chunks)
+        return [chunk for chunk in self.chunks_near(frustum.eye.x, frustum.eye.z) if self.chunk_visible(chunk, frustum)]
+    def tile_allowed(self, tile, extent=None, around=None, min_distance=0.0, max_distance=None, occupied=()):
+        # Spawn constraints for one tile
+        x, z = tile[0] - self.half + 0.5, tile[1] - self.half + 0.5
+        if extent is not None and (abs(x) > extent or abs(z) > extent):
+            return False
+        if around is not None:
+            distance_sq = (x - around.x) ** 2 + (z - around.z) ** 2
+            if distance_sq < min_distance * min_distance:
+                return False
+            if max_distance is not None and distance_sq > max_distance * max_distance:
+                return False
+        return tile not in occupied
+    def sample_free_tile(self, rng, extent=None, around=None, min_distance=0.0, max_distance=None, occupied=()):
+        # Only chunks that can satisfy extent/max_distance are considered, weighted by their free tiles. A few
+        # draws settle the usual case in O(1); if they all miss the constraints, one scan of those chunks finds
+        # a tile whenever any qualifies, so None really means there is no room
+        limit = extent if extent is not None else self.half
+        min_x, max_x, min_z, max_z = -limit, limit, -limit, limit
+        if around is not None and max_distance is not None:
+            min_x, max_x = max(min_x, around.x - max_distance), min(max_x, around.x + max_distance)
+            min_z, max_z = max(min_z, around.z - max_distance), min(max_z, around.z + max_distance)
+        if min_x > max_x or min_z > max_z:
+            return None
+        chunks = [chunk for chunk in self.chunks_in(min_x, max_x, min_z, max_z) if self.chunk_free[chunk]]
+        if not chunks:
+            return None
+        weights = []
+        total = 0
+        for chunk in chunks:
+            total += len(self.chunk_free[chunk])
+            weights.append(total)
+        constraints = (extent, around, min_distance, max_distance, occupied)
+        for _ in range(8):
+            free = self.chunk_free[rng.choices(chunks, cum_weights=weights)[0]]
+            tile = free[rng.randrange(len(free))]
+            if self.tile_allowed(tile, *constraints):
+                return tile
+        candidates = [tile for chunk in chunks for tile in self.chunk_free[chunk] if self.tile_allowed(tile, *constraints)]
+        return rng.choice(candidates) if candidates else None
+    def sample_free_position(self, rng, y, jitter=0.0, **constraints):# World point on a free tile, or None
+        tile = self.sample_free_tile(rng, **constraints)
+        if tile is None:
+            return None
+        return Vector3(tile[0] - self.half + 0.5 + rng.uniform(-jitter, jitter), y,
+                       tile[1] - self.half + 0.5 + rng.uniform(-jitter, jitter))
+    def wobble_phase(self):# Phase of sin(0.8t), wrapped to one period: raw epoch seconds make sin's range reduction slow
+        return time.time() % (2.5 * math.pi) * 0.8
     def get_tile_at(self, world_x, world_z):# Get tile type at world coordinates
-        tile_x = int(world_x + self.size//2)
-        tile_z = int(world_z + self.size//2)
+        tile_x = int(world_x + self.half)
+        tile_z = int(world_z + self.half)
         if 0 <= tile_x < self.size and 0 <= tile_z < self.size:
-            return self.tile_states[tile_x][tile_z]
+            return self.state_rows[tile_x][tile_z]
         return 0
-    def get_tile_height(self, world_x, world_z):# Get tile height at world coordinates
-        tile_x = int(world_x + self.size//2)
-        tile_z = int(world_z + self.size//2)
+    def tile_coords(self, world_x, world_z):# Grid indices of the tile under a world point (may be off the grid)
+        return int(world_x + self.half), int(world_z + self.half)
+    def tile_centre(self, world_x, world_z):# World centre of the tile under a world point
+        tile_x, tile_z = self.tile_coords(world_x, world_z)
+        return tile_x - self.half + 0.5, tile_z - self.half + 0.5
+    def is_open(self, world_x, world_z):# True when no wall touches the 3x3 tiles around this point
+        tile_x, tile_z = self.tile_coords(world_x, world_z)
+        return 0 <= tile_x < self.size and 0 <= tile_z < self.size and self.open_tiles[tile_x][tile_z]
+    def update_flow_field(self, world_x, world_z):# BFS out from the target's tile, at most FLOW_RADIUS tiles;
+        # only reruns when the target changes tile or the grid changes
+        target = self.tile_coords(world_x, world_z)
+        if self.flow_key == (target, self.version):
+            return
+        self.flow_key = (target, self.version)
+        self.flow_next = None
+        size = self.size
+        target_x, target_z = target
+        if not (0 <= target_x < size and 0 <= target_z < size):
+            return
+        # The search runs on a flat window around the target with a blocked one-tile border, so neighbour
+        # steps are plain offsets and need no bounds checks; tiles off the grid count as walls
+        width = 2*FLOW_RADIUS + 3
+        min_x, min_z = target_x - FLOW_RADIUS - 1, target_z - FLOW_RADIUS - 1
+        blocked = bytearray(b'\x01') * (width * width)
+        z0, z1 = max(min_z + 1, 0), min(target_z + FLOW_RADIUS + 1, size)
+        for x in range(max(min_x + 1, 0), min(target_x + FLOW_RADIUS + 1, size)):
+            base = (x - min_x) * width - min_z
+            blocked[base + z0:base + z1] = bytes(state == 1 for state in self.state_rows[x][z0:z1])
+        parent = [-1] * (width * width)
+        start = (target_x - min_x) * width + target_z - min_z
+        parent[start] = start
+        steps = [(dx * width + dz, dx * width, dz) for dx, dz in FLOW_STEPS]
+        queue = deque([start])
+        while queue:
+            cell = queue.popleft()
+            for step, step_x, step_z in steps:
+                neighbour = cell + step
+                if parent[neighbour] >= 0 or blocked[neighbour]:
+                    continue
+                if step_x and step_z and (blocked[cell + step_x] or blocked[cell + step_z]):# No cutting past a wall corner
+                    continue
+                parent[neighbour] = cell
+                queue.append(neighbour)
+        self.flow_next = (min_x, min_z, width, parent)
+    def flow_waypoint(self, world_x, world_z):# World centre of the next tile towards the flow target, or None
+        if self.flow_next is None:
+            return None
+        min_x, min_z, width, parent = self.flow_next
+        tile_x, tile_z = self.tile_coords(world_x, world_z)
+        local_x, local_z = tile_x - min_x, tile_z - min_z
+        if not (0 <= local_x < width and 0 <= local_z < width):
+            return None
+        cell = local_x * width + local_z
+        step = parent[cell]
+        if step < 0 or step == cell:# Unreachable, out of range, or already on the target tile
+            return None
+        step_x, step_z = divmod(step, width)
+        return step_x + min_x - self.half + 0.5, step_z + min_z - self.half + 0.5
+    def traverse(self, x0, z0, x1, z1):# Amanatides-Woo walk: yields (tile_x, tile_z, t_enter) for every tile
+        # the segment crosses, in order; a segment through a tile corner also yields both side tiles
+        half = self.half
+        start_x, start_z = x0 + half, z0 + half
+        dx, dz = x1 - x0, z1 - z0
+        tile_x, tile_z = math.floor(start_x), math.floor(start_z)
+        end_x, end_z = math.floor(x1 + half), math.floor(z1 + half)
+        step_x = 1 if dx > 0 else -1
+        step_z = 1 if dz > 0 else -1
+        delta_x = abs(1 / dx) if dx else math.inf
+        delta_z = abs(1 / dz) if dz else math.inf
+        t_x = ((tile_x + 1 - start_x) if dx > 0 else (start_x - tile_x)) * delta_x if dx else math.inf
+        t_z = ((tile_z + 1 - start_z) if dz > 0 else (start_z - tile_z)) * delta_z if dz else math.inf
+        yield tile_x, tile_z, 0.0
+        while tile_x != end_x or tile_z != end_z:
+            if t_x < t_z:
+                t = t_x
+                tile_x += step_x
+                t_x += delta_x
+            elif t_z < t_x:
+                t = t_z
+                tile_z += step_z
+                t_z += delta_z
+            else:
+                t = t_x
+                if t > 1:
+                    return
+                yield tile_x + step_x, tile_z, t
+                yield tile_x, tile_z + step_z, t
+                tile_x += step_x
+                tile_z += step_z
+                t_x += delta_x
+                t_z += delta_z
+            if t > 1:# Float drift past the end tile
+                return
+            yield tile_x, tile_z, t
+    def segment_hit(self, x0, z0, x1, z1):# First wall tile along a segment as (hit_x, hit_z, tile_x, tile_z), else None
+        size, rows = self.size, self.state_rows
+        for tile_x, tile_z, t in self.traverse(x0, z0, x1, z1):
+            if 0 <= tile_x < size and 0 <= tile_z < size and rows[tile_x][tile_z] == 1:
+                return x0 + (x1 - x0) * t, z0 + (z1 - z0) * t, tile_x, tile_z
+        return None
+    def walls_at(self, tile_x, tile_z):# Vectorized wall test on grid indices; off-grid counts as open
+        inside = (tile_x >= 0) & (tile_x < self.size) & (tile_z >= 0) & (tile_z < self.size)
+        walls = np.zeros(inside.shape, dtype=bool)
+        walls[inside] = self.tile_states[self.tile_index(tile_x[inside], tile_z[inside])] == 1
+        return walls
+    def line_of_sight(self, x0, z0, x1, z1):# No wall between the tiles under two points; cached per tile pair
+        start = self.tile_coords(x0, z0)
+        end = self.tile_coords(x1, z1)
+        if self.los_version != self.version or len(self.los_cache) > 65536:
+            self.los_cache.clear()
+            self.los_version = self.version
+        key = (start, end)
+        clear = self.los_cache.get(key)
+        if clear is None:
+            half = self.half
+            clear = True
+            for tile_x, tile_z, _ in self.traverse(start[0] - half + 0.5, start[1] - half + 0.5,
+                                                   end[0] - half + 0.5, end[1] - half + 0.5):
+                if 0 <= tile_x < self.size and 0 <= tile_z < self.size and self.state_rows[tile_x][tile_z] == 1:
+                    clear = False
+                    break
+            self.los_cache[key] = clear
+        return clear
+    def get_tile_height(self, world_x, world_z):# Get tile height at world coordinates, wall wobble included
+        tile_x = int(world_x + self.half)
+        tile_z = int(world_z + self.half)
         if 0 <= tile_x < self.size and 0 <= tile_z < self.size:
-            return self.tile_heights[tile_x][tile_z]
+            height = float(self.tile_heights[self.tile_index(tile_x, tile_z)])
+            if self.state_rows[tile_x][tile_z] == 1:
+                height += WALL_WOBBLE * math.sin(self.wobble_phase() + tile_x + tile_z)
+            return height
         return 0
-    def draw(self):# Draw arena tiles and walls
-        for x in range(-self.size//2, self.size//2):
-            for z in range(-self.size//2, self.size//2):
-                tile_x = x + self.size//2
-                tile_z = z + self.size//2
-                state = self.tile_states[tile_x][tile_z]
-                height = self.tile_heights[tile_x][tile_z]
-                glPushMatrix()
-                glTranslatef(x, height/2, z)
-                if state == 2:
-                    lava_intensity = 0.9 + 0.3 * math.sin(time.time() * 3 + x + z)
-                    glColor3f(1.0, lava_intensity * 0.4, 0.0)
-                    glColor3f(1.0 * lava_intensity, 0.6, 0.0)
-                    glScalef(1.2, max(height, 0.1) + 0.3, 1.2)
-                    glutSolidCube(1)
-                    glScalef(1/1.2, 1/(max(height, 0.1) + 0.3), 1/1.2)
-                    glColor3f(1.0, lava_intensity * 0.4, 0.0)
-                elif state == 1:
-                    glColor3f(0.3, 0.3, 0.7)
-                else:
-                    if (x + z) % 2 == 0:
-                        glColor3f(0.8, 0.8, 0.8)
-                    else:
-                        glColor3f(0.6, 0.6, 0.6)
-                glScalef(1, max(height, 0.1), 1)
-                glutSolidCube(1)
-                glPopMatrix()
+    def tile_indices(self, xs, zs):# Vectorized tile_coords: tile coordinates and an in-bounds mask
+        tile_x = (np.asarray(xs, dtype=np.float64) + self.half).astype(np.int64)
+        tile_z = (np.asarray(zs, dtype=np.float64) + self.half).astype(np.int64)
+        inside = (tile_x >= 0) & (tile_x < self.size) & (tile_z >= 0) & (tile_z < self.size)
+        return tile_x[inside], tile_z[inside], inside
+    def get_heights_at(self, xs, zs):# Tile heights for many world points in one call
+        if np is None:
+            return [self.get_tile_height(x, z) for x, z in zip(xs, zs)]
+        tile_x, tile_z, inside = self.tile_indices(xs, zs)
+        index = self.tile_index(tile_x, tile_z)
+        wobble = WALL_WOBBLE * np.sin(self.wobble_phase() + tile_x + tile_z)
+        heights = np.zeros(inside.shape)
+        heights[inside] = self.tile_heights[index] + np.where(self.tile_states[index] == 1, wobble, 0.0)
+        return heights
+    def draw_tile(self, x, z, state, height):# One tile at world column (x, z)
+        glPushMatrix()
+        glTranslatef(x, height/2, z)
+        if state == 2:
+            lava_intensity = 0.9 + 0.3 * math.sin(time.time() * 3 + x + z)
+            glColor3f(1.0, lava_intensity * 0.4, 0.0)
+            glColor3f(1.0 * lava_intensity, 0.6, 0.0)
+            glScalef(1.2, max(height, 0.1) + 0.3, 1.2)
+            glutSolidCube(1)
+            glScalef(1/1.2, 1/(max(height, 0.1) + 0.3), 1/1.2)
+            glColor3f(1.0, lava_intensity * 0.4, 0.0)
+        elif state == 1:
+            glColor3f(0.3, 0.3, 0.7)
+        else:
+            if (x + z) % 2 == 0:
+                glColor3f(0.8, 0.8, 0.8)
+            else:
+                glColor3f(0.6, 0.6, 0.6)
+        glScalef(1, max(height, 0.1), 1)
+        glutSolidCube(1)
+        glPopMatrix()
+    def draw_boundary_walls(self):
         glColor3f(0.15, 0.15, 0.4)
         wall_height = 6
+        low, high = -self.half - 0.5, self.size - self.half + 0.5# Odd sizes have one more column on the + side
+        middle = (low + high) / 2
         for i in range(4):
             glPushMatrix()
             if i == 0:
-                glTranslatef(0, wall_height/2, -self.size//2 - 0.5)
+                glTranslatef(middle, wall_height/2, low)
                 glScalef(self.size + 1, wall_height, 1)
             elif i == 1:
-                glTranslatef(0, wall_height/2, self.size//2 + 0.5)
+                glTranslatef(middle, wall_height/2, high)
                 glScalef(self.size + 1, wall_height, 1)
             elif i == 2:
-                glTranslatef(-self.size//2 - 0.5, wall_height/2, 0)
+                glTranslatef(low, wall_height/2, middle)
                 glScalef(1, wall_height, self.size + 1)
             else:
-                glTranslatef(self.size//2 + 0.5, wall_height/2, 0)
+                glTranslatef(high, wall_height/2, middle)
                 glScalef(1, wall_height, self.size + 1)
             glutSolidCube(1)
             glPopMatrix()
-class EnhancedGame:
+    def build_chunk_list(self, chunk):# Bake one chunk's floor tiles into its display list
+        if self.chunk_lists[chunk] is None:
+            self.chunk_lists[chunk] = glGenLists(1)
+        glNewList(self.chunk_lists[chunk], GL_COMPILE)
+        rows = self.state_rows
+        for tile_x, tile_z in self.chunk_tiles(chunk):
+            if rows[tile_x][tile_z] == 0:
+                self.draw_tile(tile_x - self.half, tile_z - self.half, 0, 0)
+        glEndList()
+        self.chunk_dirty[chunk] = False
+    def draw(self, frustum=None):# Draw arena tiles and walls; returns (drawn, culled) tile counts
+        if self.use_instancing and self.instancer is None:
+            self.instancer = TileInstancer.create()
+            self.use_instancing = self.instancer is not None
+        if self.instancer:
+            if self.static_dirty:
+                self.instancer.rebuild(self)
+                self.static_dirty = False
+            counts = self.instancer.draw(self, frustum)
+            self.draw_boundary_walls()
+            return counts
+        half = self.half
+        heights = self.tile_heights
+        rows = self.state_rows
+        phase = self.wobble_phase()
+        drawn = 0
+        for chunk in self.visible_chunks(frustum):
+            if self.chunk_dirty[chunk] or self.chunk_lists[chunk] is None:
+                self.build_chunk_list(chunk)
+            glCallList(self.chunk_lists[chunk])# Baked floor: one call per chunk, culled per chunk
+            drawn += len(self.chunk_free[chunk])
+            for tile_x, tile_z in self.chunk_animated[chunk]:# Only wall and lava tiles are re-submitted every frame
+                height = float(heights[self.tile_index(tile_x, tile_z)])
+                if rows[tile_x][tile_z] == 1:
+                    height += WALL_WOBBLE * math.sin(phase + tile_x + tile_z)
+                if frustum and not frustum.sphere_visible(tile_x - half, height / 2, tile_z - half,
+                                                          0.5 * math.sqrt(2 * 1.44 + (max(height, 0.1) + 0.3) ** 2)):
+                    continue
+                self.draw_tile(tile_x - half, tile_z - half, rows[tile_x][tile_z], height)
+                drawn += 1
+        self.draw_boundary_walls()
+        return drawn, self.size * self.size - drawn
+def hud_font(name):
+    return GLUT_BITMAP_HELVETICA_18 if name == 'large' else GLUT_BITMAP_HELVETICA_12
+def draw_hud_immediate(elements):# Fallback HUD path: quads and one glutBitmapCharacter per character
+    for element in elements:
+        if element[0] == 'rect':
+            _, x0, y0, x1, y1, color = element
+            glColor3f(*color)
+            glBegin(GL_QUADS)
+            glVertex3f(x0, y0, 0)
+            glVertex3f(x1, y0, 0)
+            glVertex3f(x1, y1, 0)
+            glVertex3f(x0, y1, 0)
+            glEnd()
+        else:
+            _, x, y, font, text, color = element
+            glColor3f(*color)
+            glRasterPos(x, y)
+            for char in text:
+                glutBitmapCharacter(hud_font(font), ord(char))
+class GlyphAtlas:# The GLUT bitmap fonts rendered once and read back into a single alpha texture
+    FONTS = (('large', 24, 6), ('small', 16, 4))# (font, cell height, descent below the baseline)
     def __init__(self):
+        self.glyphs = {}# (font, code) -> (u0, v0, u1, v1, width, cell height, descent)
+        self.texture = None
+    def build(self):# Draws into the back buffer, so it must run before the frame is cleared
+        width, height = WINDOW_WIDTH, WINDOW_HEIGHT
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, width, 0, height, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glDisable(GL_DEPTH_TEST)
+        glClearColor(0.0, 0.0, 0.0, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT)
+        glColor3f(1.0, 1.0, 1.0)
+        cells = {}
+        x, y = 0, 0
+        for font, cell_height, descent in self.FONTS:
+            for code in range(32, 127):
+                glyph_width = glutBitmapWidth(hud_font(font), code)
+                if x + glyph_width + 1 > width:
+                    x, y = 0, y + cell_height
+                glRasterPos2f(x, y + descent)
+                glutBitmapCharacter(hud_font(font), code)
+                cells[(font, code)] = (x, y, glyph_width, cell_height, descent)
+                x += glyph_width + 1
+            x, y = 0, y + cell_height
+        atlas_height = y
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        glReadBuffer(GL_BACK)
+        pixels = glReadPixels(0, 0, width, atlas_height, GL_RED, GL_UNSIGNED_BYTE)
+        self.texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_ALPHA, width, atlas_height, 0, GL_ALPHA, GL_UNSIGNED_BYTE, pixels)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        for key, (gx, gy, glyph_width, cell_height, descent) in cells.items():
+            self.glyphs[key] = (gx / width, gy / atlas_height, (gx + glyph_width) / width,
+                                (gy + cell_height) / atlas_height, glyph_width, cell_height, descent)
+        glEnable(GL_DEPTH_TEST)
+        glPopMatrix()
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+    def emit_text(self, x, y, font, text):# Textured quads for one string, baseline at y (y grows downwards)
+        for char in text:
+            glyph = self.glyphs.get((font, ord(char)))
+            if glyph is None:
+                continue
+            u0, v0, u1, v1, glyph_width, cell_height, descent = glyph
+            top, bottom = y - (cell_height - descent), y + descent
+            glTexCoord2f(u0, v1); glVertex3f(x, top, 0)
+            glTexCoord2f(u1, v1); glVertex3f(x + glyph_width, top, 0)
+            glTexCoord2f(u1, v0); glVertex3f(x + glyph_width, bottom, 0)
+            glTexCoord2f(u0, v0); glVertex3f(x, bottom, 0)
+            x += glyph_width
+class HudRenderer:# Retained HUD: one display list, recompiled only when a displayed value changes
+    def __init__(self):
+        self.atlas = None
+        self.atlas_failed = False
+        self.display_list = None
+        self.key = None
+        self.rebuilds = 0
+    def prepare(self):
+        if self.atlas is None and not self.atlas_failed:
+            try:
+                atlas = GlyphAtlas()
+                atlas.build()
+                self.atlas = atlas
+            except Exception as error:
+                print(f"Glyph atlas unavailable, drawing HUD text per character: {error}")
+                self.atlas_failed = True
+    def rebuild(self, elements):
+        if self.display_list is None:
+            self.display_list = glGenLists(1)
+        glNewList(self.display_list, GL_COMPILE)
+        self.emit(elements)
+        glEndList()
+        self.rebuilds += 1
+    def draw_immediate(self, elements):# Uncached path for overlays that change every frame
+        if self.atlas:
+            self.emit(elements)
+        else:
+            draw_hud_immediate(elements)
+    def emit(self, elements):# Elements keep their order; texturing only toggles between rect and text runs
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glBindTexture(GL_TEXTURE_2D, self.atlas.texture)
+        textured = False
+        glBegin(GL_QUADS)
+        for element in elements:
+            if (element[0] == 'text') != textured:
+                glEnd()
+                textured = not textured
+                if textured:
+                    glEnable(GL_TEXTURE_2D)
+                    glEnable(GL_BLEND)
+                else:
+                    glDisable(GL_BLEND)
+                    glDisable(GL_TEXTURE_2D)
+                glBegin(GL_QUADS)
+            if element[0] == 'rect':
+                _, x0, y0, x1, y1, color = element
+                glColor3f(*color)
+                glVertex3f(x0, y0, 0)
+                glVertex3f(x1, y0, 0)
+                glVertex3f(x1, y1, 0)
+                glVertex3f(x0, y1, 0)
+            else:
+                _, x, y, font, text, color = element
+                glColor3f(*color)
+                self.atlas.emit_text(x, y, font, text)
+        glEnd()
+        glDisable(GL_BLEND)
+        glDisable(GL_TEXTURE_2D)
+        glBindTexture(GL_TEXTURE_2D, 0)
+    def draw(self, game):
+        key = game.hud_key()
+        if key != self.key:
+            self.rebuild(game.hud_elements())
+            self.key = key
+        glCallList(self.display_list)
+REPLAY_SETTINGS = {'arena_size': ARENA_SIZE, 'numpy_bullets': False, 'max_bullets': MAX_BULLETS}# Flags a recording's
+# header stores, with their defaults: a replay is only exact on the same arena and bullet engine
+class InputRecorder:# Logs held input and one-shot presses per tick for exact replays
+    def __init__(self, seed, path, settings=None):
+        self.seed = seed
+        self.settings = settings or {}
+        self.path = path
+        self.tick = 0
+        self.frames = []# [tick, keys, special_keys, mouse_buttons, events], only when the input changed
+        self.last_state = None
+        self.pending_events = []
+    def record_event(self, kind, code):
+        self.pending_events.append([kind, code])
+    def capture(self, game):# Called once per tick from handle_input
+        state = [sorted(game.keys), sorted(game.special_keys), sorted(game.mouse_buttons)]
+        if state != self.last_state or self.pending_events:
+            self.frames.append([self.tick] + state + [self.pending_events])
+            self.last_state = state
+            self.pending_events = []
+        self.tick += 1
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({'version': 2, 'seed': self.seed, 'settings': self.settings, 'ticks': self.tick,
+                       'frames': self.frames}, f, separators=(',', ':'))
+class InputPlayback:# Feeds a recording back into a game tick by tick
+    def __init__(self, seed, ticks, frames, settings=None):
+        self.seed = seed
+        self.settings = settings or {}# Empty for version 1 recordings, which only stored the seed
+        self.ticks = ticks
+        self.frames = frames
+        self.tick = 0
+        self.index = 0
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['seed'], data['ticks'], data['frames'], data.get('settings'))
+    def finished(self):
+        return self.tick >= self.ticks
+    def apply(self, game):# Restore the input state recorded for the current tick
+        while self.index < len(self.frames) and self.frames[self.index][0] <= self.tick:
+            _, keys, special, mouse, events = self.frames[self.index]
+            game.keys = set(keys)
+            game.special_keys = set(special)
+            game.mouse_buttons = set(mouse)
+            for kind, code in events:
+                if kind == 'k':
+                    game.press_key(bytes([code]))
+                else:
+                    game.press_mouse(code)
+            self.index += 1
+        self.tick += 1
+class EnhancedGame:
+    def __init__(self, seed=None, vectorized_bullets=False, max_bullets=MAX_BULLETS, arena_size=ARENA_SIZE,
+                 tuning=None):
+        self.seed = seed
+        self.bullet_pool = BulletPool(max_bullets)
+        self.enemy_grid = SpatialHash()
+        self.hud = None
+        self.profiler = FrameProfiler()
+        self.spawn_failures = 0
+        self.frustum = None
+        self.show_stats = False
+        self.cull_stats = (0, 0)
+        self.bullet_arrays = BulletArrays(limit=max_bullets) if vectorized_bullets and np is not None else None
+        self.rng = random.Random(seed)# Per-game RNG so a seeded session is reproducible
+        self.tuning = merge_tuning(tuning)
+        self.recorder = None
+        self.playback = None
         self.player = EnhancedPlayer(self)
         self.enemies = []
         self.bullets = []
         self.enemy_bullets = []
         self.collectibles = []
         self.power_ups = []
-        self.arena = Arena()
+        self.arena = Arena(self.rng, arena_size)
         self.score = 0
         self.high_score = 0
         self.game_over = False
@@ -774,14 +1939,20 @@ class EnhancedGame:
         self.keys = set()
         self.special_keys = set()
         self.mouse_buttons = set()
+        self.games_played = 0
         self.reset_game()
     def reset_game(self):# Reset game state for new game
+        self.games_played += 1
         self.player.reset()
         self.enemies = []
+        for bullet in self.bullets + self.enemy_bullets:
+            self.bullet_pool.release(bullet)
         self.bullets = []
         self.enemy_bullets = []
         self.collectibles = []
         self.power_ups = []
+        if self.bullet_arrays is not None:
+            self.bullet_arrays.clear()
         if self.score > self.high_score:
             self.high_score = self.score
         self.score = 0
@@ -799,102 +1970,78 @@ class EnhancedGame:
         self.arena.init_tiles()
         self.spawn_collectibles(5)
         self.spawn_enemies(4)
+    def occupied_tiles(self):# Tiles already holding the player, an enemy or a pickup
+        arena = self.arena
+        occupied = {arena.tile_coords(self.player.position.x, self.player.position.z)}
+        for group in (self.enemies, self.collectibles, self.power_ups):
+            for obj in group:
+                occupied.add(arena.tile_coords(obj.position.x, obj.position.z))
+        return occupied
+    def spawn_at(self, y, jitter=0.0, **constraints):# Free-tile spawn point; a full arena is counted, not ignored
+        pos = self.arena.sample_free_position(self.rng, y, jitter, occupied=self.occupied_tiles(), **constraints)
+        if pos is None:
+            self.spawn_failures += 1
+        return pos
     def spawn_collectibles(self, count):# Spawn crystals and power cores
         for _ in range(count):
-            attempts = 0
-            while attempts < 40:
-                pos = Vector3(
-                    random.uniform(-9, 9),
-                    0.8,
-                    random.uniform(-9, 9)
-                )
-                tile_type = self.arena.get_tile_at(pos.x, pos.z)
-                if tile_type == 0:
-                    item_type = "power_core" if random.random() < 0.3 else "crystal"
-                    self.collectibles.append(Collectible(pos, item_type))
-                    break
-                attempts += 1
+            pos = self.spawn_at(0.8, 0.3, extent=self.arena.half - 2, around=self.player.position,
+                                max_distance=VIEW_DISTANCE)
+            if pos:
+                item_type = "power_core" if self.rng.random() < 0.3 else "crystal"
+                self.collectibles.append(Collectible(pos, item_type))
     def spawn_enemies(self, count):# Spawn hunters and snipers
         for _ in range(count):
-            attempts = 0
-            while attempts < 40:
-                pos = Vector3(
-                    random.uniform(-8.5, 8.5),
-                    1.0,
-                    random.uniform(-8.5, 8.5)
-                )
-                tile_type = self.arena.get_tile_at(pos.x, pos.z)
-                if ((pos - self.player.position).length() > 6 and tile_type == 0):
-                    enemy_type = random.choices(
-                        ["hunter", "sniper"],
-                        weights=[0.75, 0.25]
-                    )[0]
-                    self.enemies.append(Enemy(pos, enemy_type))
-                    break
-                attempts += 1
+            pos = self.spawn_at(1.0, extent=self.arena.half - 2.5, around=self.player.position,
+                                min_distance=6, max_distance=VIEW_DISTANCE)
+            if pos:
+                weights = self.tuning['enemy_weights']
+                enemy_type = self.rng.choices(
+                    list(weights),
+                    weights=list(weights.values())
+                )[0]
+                self.enemies.append(Enemy(pos, enemy_type))
         self.enemies_spawned += count
     def spawn_boss(self):# Spawn a boss enemy
         if not self.boss_active:
-            attempts = 0
-            while attempts < 40:
-                pos = Vector3(
-                    random.uniform(-7, 7),
-                    1.5,
-                    random.uniform(-7, 7)
-                )
-                tile_type = self.arena.get_tile_at(pos.x, pos.z)
-                if ((pos - self.player.position).length() > 8 and tile_type == 0):
-                    self.enemies.append(Enemy(pos, "boss"))
-                    self.boss_active = True
-                    break
-                attempts += 1
+            pos = self.spawn_at(1.5, extent=self.arena.half - 4, around=self.player.position,
+                                min_distance=8, max_distance=VIEW_DISTANCE)
+            if pos:
+                self.enemies.append(Enemy(pos, "boss"))
+                self.boss_active = True
     def spawn_power_up(self):
-        if random.random() < 0.7:
-            attempts = 0
-            while attempts < 25:
-                pos = Vector3(
-                    random.uniform(-8, 8),
-                    0.8,
-                    random.uniform(-8, 8)
-                )
-                tile_type = self.arena.get_tile_at(pos.x, pos.z)
-                if tile_type == 0:
-                    power_type = random.choice(["speed", "shield", "rapid_fire"])
-                    self.power_ups.append(PowerUp(pos, power_type))
-                    break
-                attempts += 1
+        if self.rng.random() < 0.7:
+            pos = self.spawn_at(0.8, 0.3, extent=self.arena.half - 3, around=self.player.position,
+                                max_distance=VIEW_DISTANCE)
+            if pos:
+                power_type = self.rng.choice(["speed", "shield", "rapid_fire"])
+                self.power_ups.append(PowerUp(pos, power_type))
     def check_collisions(self):# Check all collisions between entities
-        for enemy in self.enemies:
-            if (enemy.active and 
-                (enemy.position - self.player.position).length() < 1.4 and
-                self.player.damage_cooldown <= 0):
+        self.enemy_grid.rebuild(self.enemies)
+        if self.player.damage_cooldown <= 0:
+            enemy = self.enemy_grid.first_hit(self.player.position, 1.4)
+            if enemy:
                 damage = 8 if enemy.enemy_type == "boss" else 5
                 self.player.take_damage(damage)
                 self.player.damage_cooldown = 100
-        for bullet in self.enemy_bullets:
-            if (bullet.active and 
-                (bullet.position - self.player.position).length() < 1.0):
+        if self.bullet_arrays is not None:
+            self.check_bullet_array_collisions()
+        player_pos = self.player.position
+        for bullet in self.enemy_bullets:# One pass; cheap axis rejection before the distance test
+            pos = bullet.position
+            if (bullet.active and abs(pos.x - player_pos.x) < 1.0 and abs(pos.z - player_pos.z) < 1.0 and
+                pos.distance_to(player_pos) < 1.0):
                 self.player.take_damage(6)
                 bullet.active = False
-        for bullet in self.bullets:
+        for bullet in self.bullets:# Each bullet only looks at enemies in its neighbouring cells
             if not bullet.active:
                 continue
-            for enemy in self.enemies:
-                if (enemy.active and 
-                    (bullet.position - enemy.position).length() < 1.3):
-                    enemy.take_damage()
-                    bullet.active = False
-                    if not enemy.active:
-                        if enemy.enemy_type == "boss":
-                            self.score += 50
-                            self.boss_active = False
-                        else:
-                            self.score += 10
-                        self.spawn_power_up()
-                    break
+            enemy = self.enemy_grid.first_hit(bullet.position, 1.3)
+            if enemy:
+                self.hit_enemy(enemy)
+                bullet.active = False
         for collectible in self.collectibles:# Collect crystals and power cores
             if (collectible.active and 
-                (collectible.position - self.player.position).length() < 1.3):
+                collectible.position.distance_to(self.player.position) < 1.3):
                 collectible.active = False
                 if collectible.item_type == "power_core":
                     self.score += 8
@@ -902,12 +2049,42 @@ class EnhancedGame:
                     self.score += 5
         for power_up in self.power_ups:# Collect power-ups
             if (power_up.active and 
-                (power_up.position - self.player.position).length() < 1.3):
+                power_up.position.distance_to(self.player.position) < 1.3):
                 self.player.use_power_up(power_up.power_type)
                 power_up.active = False
+    def hit_enemy(self, enemy):# Apply one bullet hit and score the kill
+        enemy.take_damage()
+        if not enemy.active:
+            if enemy.enemy_type == "boss":
+                self.score += 50
+                self.boss_active = False
+            else:
+                self.score += 10
+            self.spawn_power_up()
+    def check_bullet_array_collisions(self):# Vectorized bullet tests for the BulletArrays engine
+        arrays = self.bullet_arrays
+        spent = np.zeros(arrays.count, dtype=bool)
+        struck = arrays.hits(self.player.position, 1.0, False)
+        for _ in struck:
+            self.player.take_damage(6)
+        spent[struck] = True
+        for enemy in self.enemies:
+            if not enemy.active:
+                continue
+            for i in arrays.hits(enemy.position, 1.3, True):
+                if spent[i]:
+                    continue
+                self.hit_enemy(enemy)
+                spent[i] = True
+                if not enemy.active:
+                    break
+        if spent.any():
+            arrays.keep(~spent)
     def update(self):# Update game state each frame
         if self.game_over or self.victory:
             return
+        profiler = self.profiler
+        profiler.begin()
         self.day_night_cycle += 0.08
         self.camera_angle_x += (self.target_angle_x - self.camera_angle_x) * self.camera_smoothing
         self.camera_angle_y += (self.target_angle_y - self.camera_angle_y) * self.camera_smoothing
@@ -917,40 +2094,63 @@ class EnhancedGame:
         elif angle_diff < -180:
             self.target_angle_y += 360
         self.player.update(self.arena)
+        profiler.lap('player')
+        self.arena.update_flow_field(self.player.position.x, self.player.position.z)
+        profiler.lap('flow field')
         for enemy in self.enemies:
             enemy.update(self.player.position, self.arena)
             if enemy.enemy_type in ["sniper", "boss"]:
-                bullet = enemy.shoot(self.player.position)
+                bullet = enemy.shoot(self.player.position, self.rng, self.bullet_pool, self.arena)
                 if bullet:
-                    bullet.arena = self.arena
-                    self.enemy_bullets.append(bullet)
+                    if self.bullet_arrays is not None:
+                        self.adopt_bullet(bullet)
+                    else:
+                        bullet.arena = self.arena
+                        self.enemy_bullets.append(bullet)
+        profiler.lap('enemies')
+        if self.bullet_arrays is not None:
+            self.bullet_arrays.step(self.arena)
         for bullet in self.bullets:
             bullet.update()
         for bullet in self.enemy_bullets:
             bullet.update()
+        profiler.lap('bullets')
         for collectible in self.collectibles:
             collectible.update()
         for power_up in self.power_ups:
             power_up.update()
-        self.arena.update()
-        self.bullets = [b for b in self.bullets if b.active]
-        self.enemy_bullets = [b for b in self.enemy_bullets if b.active]
+        profiler.lap('pickups')
+        self.bullets = self.bullet_pool.collect(self.bullets)
+        self.enemy_bullets = self.bullet_pool.collect(self.enemy_bullets)
         self.enemies = [e for e in self.enemies if e.active]
         self.collectibles = [c for c in self.collectibles if c.active]
         self.power_ups = [p for p in self.power_ups if p.active]
         self.check_collisions()
-        if self.score >= 100 and not self.boss_active and self.score % 100 == 0:
+        profiler.lap('collisions')
+        tuning = self.tuning
+        if self.score >= tuning['boss_every'] and not self.boss_active and self.score % tuning['boss_every'] == 0:
             self.spawn_boss()
-        enemy_target = min(3 + self.score // 25, 12)
+        enemy_target = min(tuning['enemy_base'] + self.score // tuning['enemy_per_score'], tuning['enemy_max'])
         if len(self.enemies) < enemy_target and not self.boss_active:
             self.spawn_enemies(1)
         if len(self.collectibles) < 3:
             self.spawn_collectibles(2)
         if self.player.health <= 0:
             self.game_over = True
-        elif self.score >= 300:
+        elif self.score >= tuning['victory_score']:
             self.victory = True
+        profiler.lap('spawning')
     def handle_input(self):# Handle user input for movement and actions
+        self.profiler.begin()
+        if self.playback and self.playback.finished():# Hand control back with nothing left held down
+            self.playback = None
+            self.keys = set()
+            self.special_keys = set()
+            self.mouse_buttons = set()
+        if self.playback:
+            self.playback.apply(self)
+        if self.recorder:
+            self.recorder.capture(self)
         move_dir = Vector3()
         if ord('w') in self.keys or ord('W') in self.keys:
             move_dir.z -= 1
@@ -972,11 +2172,58 @@ class EnhancedGame:
         if GLUT_KEY_LEFT in self.special_keys:
             self.target_angle_y += camera_speed
         if GLUT_LEFT_BUTTON in self.mouse_buttons:
-            bullets = self.player.shoot()
-            if bullets:
-                for bullet in bullets:
-                    bullet.arena = self.arena
-                self.bullets.extend(bullets)
+            self.fire()
+        self.profiler.lap('input')
+    def fire(self):# Fire the player's weapon and track the new bullets
+        self.track_bullets(self.player.shoot())
+    def track_bullets(self, bullets):# Hand freshly acquired player bullets to whichever bullet engine is active
+        if bullets and self.bullet_arrays is not None:
+            for bullet in bullets:
+                self.adopt_bullet(bullet)
+        elif bullets:
+            for bullet in bullets:
+                bullet.arena = self.arena
+            self.bullets.extend(bullets)
+    def adopt_bullet(self, bullet):# Move a pooled bullet into the array engine; a full engine drops it as rejected
+        if not self.bullet_arrays.add(bullet):
+            self.bullet_pool.rejected += 1
+        self.bullet_pool.release(bullet)
+    def bullet_stats(self):# Occupancy of whichever bullet engine is active; the array engine borrows the pool's reject count
+        if self.bullet_arrays is None:
+            return dict(self.bullet_pool.stats(), engine='pool')
+        return {
+            'engine': 'arrays',
+            'capacity': self.bullet_arrays.limit,
+            'in_use': self.bullet_arrays.count,
+            'high_water': self.bullet_arrays.high_water,
+            'rejected': self.bullet_pool.rejected,
+        }
+    def bullet_room(self):# Whether the active bullet engine can take one more bullet
+        if self.bullet_arrays is not None:
+            return not self.bullet_arrays.full()
+        return bool(self.bullet_pool.free)
+    def press_key(self, key):# One-shot key actions (shoot, fog, jump, reset, camera)
+        if self.recorder:
+            self.recorder.record_event('k', key[0])
+        if key == b'x' or key == b'X':
+            self.fire()
+        elif key == b'f' or key == b'F':
+            self.fog_enabled = not self.fog_enabled
+        elif key == b' ':
+            self.player.jump()
+        elif key == b'r' or key == b'R':
+            self.reset_game()
+        elif key == b'c' or key == b'C':
+            self.camera_mode = (self.camera_mode + 1) % 2
+        elif key == b'p' or key == b'P':
+            self.show_stats = not self.show_stats
+            self.profiler.enabled = self.show_stats
+            self.profiler.reset()
+    def press_mouse(self, button):# One-shot mouse actions
+        if self.recorder:
+            self.recorder.record_event('m', button)
+        if button == GLUT_LEFT_BUTTON and self.camera_mode == 0:
+            self.fire()
     def setup_camera(self):# Setup OpenGL camera based on mode
         glLoadIdentity()
         if self.camera_mode == 0:# First-person mode
@@ -988,157 +2235,137 @@ class EnhancedGame:
             look_y = cam_y - math.sin(math.radians(self.camera_angle_x))
             look_z = cam_z - math.cos(math.radians(self.camera_angle_y)) * math.cos(math.radians(self.camera_angle_x))
             gluLookAt(cam_x, cam_y, cam_z, look_x, look_y, look_z, 0, 1, 0)
+            self.frustum = Frustum(Vector3(cam_x, cam_y, cam_z), Vector3(look_x, look_y, look_z), Vector3(0, 1, 0))
         elif self.camera_mode == 1:# Upper view mode
             height = 25
-            max_height_nearby = 0
-            for x_offset in range(-4, 5):
-                for z_offset in range(-4, 5):
-                    check_x = self.player.position.x + x_offset
-                    check_z = self.player.position.z + z_offset
-                    tile_height = self.arena.get_tile_height(check_x, check_z)
-                    max_height_nearby = max(max_height_nearby, tile_height)
+            offsets = range(-4, 5)
+            check_x = [self.player.position.x + x_offset for x_offset in offsets for _ in offsets]
+            check_z = [self.player.position.z + z_offset for _ in offsets for z_offset in offsets]
+            max_height_nearby = max(0, max(self.arena.get_heights_at(check_x, check_z)))
             height = max(height, max_height_nearby + 12)
             gluLookAt(self.player.position.x, height, self.player.position.z,
                      self.player.position.x, 0, self.player.position.z,
                      0, 0, -1)
-    def draw_enhanced_hud(self):
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, WINDOW_WIDTH, WINDOW_HEIGHT, 0, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
-        glDisable(GL_DEPTH_TEST)
+            self.frustum = Frustum(Vector3(self.player.position.x, height, self.player.position.z),
+                                   Vector3(self.player.position.x, 0, self.player.position.z), Vector3(0, 0, -1))
+    def hud_key(self):# Everything the cached HUD shows, bucketed to what is visible on screen
+        bar_width = 250
+        player = self.player
+        return (WINDOW_WIDTH, WINDOW_HEIGHT, self.score, self.high_score,
+                int(player.health / player.max_health * bar_width),
+                int(player.energy / player.max_energy * bar_width),
+                player.speed_boost//60 + 1 if player.speed_boost > 0 else 0,
+                player.shield_time//60 + 1 if player.shield_time > 0 else 0,
+                player.rapid_fire_time//60 + 1 if player.rapid_fire_time > 0 else 0,
+                self.game_over, self.victory)
+    def hud_elements(self):# HUD as ('rect', x0, y0, x1, y1, color) and ('text', x, y, font, text, color) items
         bar_width = 250
         bar_height = 25
-        glColor3f(0.1, 0.1, 0.1)
-        glBegin(GL_QUADS)
-        glVertex3f(15, 15, 0)
-        glVertex3f(15 + bar_width, 15, 0)
-        glVertex3f(15 + bar_width, 15 + bar_height, 0)
-        glVertex3f(15, 15 + bar_height, 0)
-        glEnd()
+        elements = [('rect', 15, 15, 15 + bar_width, 15 + bar_height, (0.1, 0.1, 0.1))]
         health_ratio = self.player.health / self.player.max_health
         if health_ratio > 0.7:
-            glColor3f(0.0, 0.9, 0.0)
+            health_color = (0.0, 0.9, 0.0)
         elif health_ratio > 0.4:
-            glColor3f(0.9, 0.9, 0.0)
+            health_color = (0.9, 0.9, 0.0)
         else:
-            glColor3f(0.9, 0.0, 0.0)
-        glBegin(GL_QUADS)
+            health_color = (0.9, 0.0, 0.0)
         health_width = health_ratio * bar_width
-        glVertex3f(15, 15, 0)
-        glVertex3f(15 + health_width, 15, 0)
-        glVertex3f(15 + health_width, 15 + bar_height, 0)
-        glVertex3f(15, 15 + bar_height, 0)
-        glEnd()
-        glColor3f(0.1, 0.1, 0.1)
-        glBegin(GL_QUADS)
-        glVertex3f(15, 50, 0)
-        glVertex3f(15 + bar_width, 50, 0)
-        glVertex3f(15 + bar_width, 50 + bar_height, 0)
-        glVertex3f(15, 50 + bar_height, 0)
-        glEnd()
-        glColor3f(0.0, 0.4, 0.9)
-        glBegin(GL_QUADS)
+        elements.append(('rect', 15, 15, 15 + health_width, 15 + bar_height, health_color))
+        elements.append(('rect', 15, 50, 15 + bar_width, 50 + bar_height, (0.1, 0.1, 0.1)))
         energy_width = (self.player.energy / self.player.max_energy) * bar_width# Draw energy bar
-        glVertex3f(15, 50, 0)
-        glVertex3f(15 + energy_width, 50, 0)
-        glVertex3f(15 + energy_width, 50 + bar_height, 0)
-        glVertex3f(15, 50 + bar_height, 0)
-        glEnd()
-        glColor3f(1.0, 1.0, 1.0)
-        glRasterPos(15, 95)  
-        score_text = f"SCORE: {self.score}"
-        for char in score_text:# Draw score and high score
-            glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(char))
-        glColor3f(1.0, 0.8, 0.0)
-        glRasterPos(15, 115)
-        high_score_text = f"HIGH SCORE: {self.high_score}"
-        for char in high_score_text:
-            glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(char))
+        elements.append(('rect', 15, 50, 15 + energy_width, 50 + bar_height, (0.0, 0.4, 0.9)))
+        elements.append(('text', 15, 95, 'large', f"SCORE: {self.score}", (1.0, 1.0, 1.0)))
+        elements.append(('text', 15, 115, 'large', f"HIGH SCORE: {self.high_score}", (1.0, 0.8, 0.0)))
         y_offset = 135
         if self.player.speed_boost > 0:
-            glColor3f(0.0, 1.0, 0.2)
-            glRasterPos(15, y_offset)
-            speed_text = f"SPEED BOOST: {self.player.speed_boost//60 + 1}s"
-            for char in speed_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_12, ord(char))
+            elements.append(('text', 15, y_offset, 'small',
+                             f"SPEED BOOST: {self.player.speed_boost//60 + 1}s", (0.0, 1.0, 0.2)))
             y_offset += 20
         if self.player.shield_time > 0:
-            glColor3f(0.0, 0.6, 1.0)
-            glRasterPos(15, y_offset)
-            shield_text = f"SHIELD: {self.player.shield_time//60 + 1}s"
-            for char in shield_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_12, ord(char))
+            elements.append(('text', 15, y_offset, 'small',
+                             f"SHIELD: {self.player.shield_time//60 + 1}s", (0.0, 0.6, 1.0)))
             y_offset += 20
         if self.player.rapid_fire_time > 0:
-            glColor3f(1.0, 0.6, 0.0)
-            glRasterPos(15, y_offset)
-            rapid_text = f"RAPID FIRE: {self.player.rapid_fire_time//60 + 1}s"
-            for char in rapid_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_12, ord(char))
-        if self.camera_mode == 0:
-            center_x, center_y = WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2
-            spread = 10
-            if self.player.velocity.length() > 0.02:
-                spread += int(self.player.velocity.length() * 120)
-            glColor3f(0.0, 1.0, 0.2)
-            glLineWidth(3.0)
-            glBegin(GL_LINES)
-            glVertex3f(center_x - spread - 12, center_y, 0)
-            glVertex3f(center_x - spread, center_y, 0)
-            glVertex3f(center_x + spread, center_y, 0)
-            glVertex3f(center_x + spread + 12, center_y, 0)
-            glVertex3f(center_x, center_y - spread - 12, 0)
-            glVertex3f(center_x, center_y - spread, 0)
-            glVertex3f(center_x, center_y + spread, 0)
-            glVertex3f(center_x, center_y + spread + 12, 0)
-            glEnd()
-            glLineWidth(1.0)
+            elements.append(('text', 15, y_offset, 'small',
+                             f"RAPID FIRE: {self.player.rapid_fire_time//60 + 1}s", (1.0, 0.6, 0.0)))
         if self.game_over:
-            glColor3f(0.0, 0.0, 0.0)
-            glBegin(GL_QUADS)
-            glVertex3f(0, 0, 0)
-            glVertex3f(WINDOW_WIDTH, 0, 0)
-            glVertex3f(WINDOW_WIDTH, WINDOW_HEIGHT, 0)
-            glVertex3f(0, WINDOW_HEIGHT, 0)
-            glEnd()
-            glColor3f(1.0, 0.2, 0.2)
-            glRasterPos(WINDOW_WIDTH//2 - 80, WINDOW_HEIGHT//2 - 30)
-            game_over_text = "GAME OVER"
-            for char in game_over_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(char))
-            glColor3f(1.0, 1.0, 1.0)
-            glRasterPos(WINDOW_WIDTH//2 - 100, WINDOW_HEIGHT//2 + 10)
-            restart_text = "Press R to Restart"
-            for char in restart_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(char))
+            elements.append(('rect', 0, 0, WINDOW_WIDTH, WINDOW_HEIGHT, (0.0, 0.0, 0.0)))
+            elements.append(('text', WINDOW_WIDTH//2 - 80, WINDOW_HEIGHT//2 - 30, 'large', "GAME OVER", (1.0, 0.2, 0.2)))
+            elements.append(('text', WINDOW_WIDTH//2 - 100, WINDOW_HEIGHT//2 + 10, 'large',
+                             "Press R to Restart", (1.0, 1.0, 1.0)))
         elif self.victory:
-            glColor3f(0.0, 0.5, 0.0)
-            glBegin(GL_QUADS)
-            glVertex3f(0, 0, 0)
-            glVertex3f(WINDOW_WIDTH, 0, 0)
-            glVertex3f(WINDOW_WIDTH, WINDOW_HEIGHT, 0)
-            glVertex3f(0, WINDOW_HEIGHT, 0)
-            glEnd()
-            glColor3f(1.0, 1.0, 0.0)
-            glRasterPos(WINDOW_WIDTH//2 - 70, WINDOW_HEIGHT//2 - 30)
-            victory_text = "VICTORY!"
-            for char in victory_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(char))
-            glColor3f(1.0, 1.0, 1.0)
-            glRasterPos(WINDOW_WIDTH//2 - 120, WINDOW_HEIGHT//2 + 10)
-            champion_text = "You are the Champion!"
-            for char in champion_text:
-                glutBitmapCharacter(GLUT_BITMAP_HELVETICA_18, ord(char))
+            elements.append(('rect', 0, 0, WINDOW_WIDTH, WINDOW_HEIGHT, (0.0, 0.5, 0.0)))
+            elements.append(('text', WINDOW_WIDTH//2 - 70, WINDOW_HEIGHT//2 - 30, 'large', "VICTORY!", (1.0, 1.0, 0.0)))
+            elements.append(('text', WINDOW_WIDTH//2 - 120, WINDOW_HEIGHT//2 + 10, 'large',
+                             "You are the Champion!", (1.0, 1.0, 1.0)))
+        return elements
+    def stats_elements(self):# Debug overlay lines, toggled with P
+        drawn, culled = self.cull_stats
+        total = drawn + culled
+        lines = [f"CULLED: {culled}/{total} ({culled * 100 // max(total, 1)}%)"]
+        y = WINDOW_HEIGHT - 15 - 18 * (len(lines) - 1)
+        elements = []
+        for line in lines:
+            elements.append(('text', WINDOW_WIDTH - 260, y, 'small', line, (1.0, 1.0, 1.0)))
+            y += 18
+        bar_x = WINDOW_WIDTH - 220# Phase bars, 20px per ms; the thin marker is the window's max
+        y = 20
+        for name, (average, peak) in self.profiler.stats().items():
+            share = average / (SIM_DT * 1000)
+            color = (0.2, 0.9, 0.2) if share < 0.1 else (0.9, 0.9, 0.2) if share < 0.3 else (0.9, 0.2, 0.2)
+            elements.append(('rect', bar_x, y - 10, bar_x + 200, y, (0.1, 0.1, 0.1)))
+            elements.append(('rect', bar_x, y - 10, bar_x + min(average * 20, 200), y, color))
+            marker = bar_x + min(peak * 20, 198)
+            elements.append(('rect', marker, y - 10, marker + 2, y, (1.0, 1.0, 1.0)))
+            elements.append(('text', bar_x - 190, y, 'small', f"{name}: {average:.2f}/{peak:.2f} ms", (1.0, 1.0, 1.0)))
+            y += 16
+        return elements
+    def draw_crosshair(self):# Spread follows the player's speed, so it is drawn live every frame
+        center_x, center_y = WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2
+        spread = 10
+        if self.player.velocity.length() > 0.02:
+            spread += int(self.player.velocity.length() * 120)
+        glColor3f(0.0, 1.0, 0.2)
+        glLineWidth(3.0)
+        glBegin(GL_LINES)
+        glVertex3f(center_x - spread - 12, center_y, 0)
+        glVertex3f(center_x - spread, center_y, 0)
+        glVertex3f(center_x + spread, center_y, 0)
+        glVertex3f(center_x + spread + 12, center_y, 0)
+        glVertex3f(center_x, center_y - spread - 12, 0)
+        glVertex3f(center_x, center_y - spread, 0)
+        glVertex3f(center_x, center_y + spread, 0)
+        glVertex3f(center_x, center_y + spread + 12, 0)
+        glEnd()
+        glLineWidth(1.0)
+    def draw_enhanced_hud(self):
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, WINDOW_WIDTH, WINDOW_HEIGHT, 0, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glDisable(GL_DEPTH_TEST)
+        if self.camera_mode == 0:
+            self.draw_crosshair()
+        if self.hud.atlas:
+            self.hud.draw(self)
+        else:
+            draw_hud_immediate(self.hud_elements())
+        if self.show_stats:
+            self.hud.draw_immediate(self.stats_elements())
         glEnable(GL_DEPTH_TEST)
         glPopMatrix()
         glMatrixMode(GL_PROJECTION)
         glPopMatrix()
         glMatrixMode(GL_MODELVIEW)
     def draw(self):# Render the entire scene
+        profiler = self.profiler
+        profiler.begin()
+        if self.hud is None:
+            self.hud = HudRenderer()
+        self.hud.prepare()
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         day_factor = (math.sin(self.day_night_cycle) + 1) / 2
         bg_r = 0.08 + 0.6 * day_factor
@@ -1149,76 +2376,80 @@ class EnhancedGame:
         glEnable(GL_COLOR_MATERIAL)
         light_intensity = 0.7 + 0.5 * day_factor
         glColor3f(light_intensity, light_intensity * 0.95, light_intensity * 0.85)
-        self.arena.draw()
+        profiler.lap('draw setup')
+        drawn, culled = self.arena.draw(self.frustum)
+        profiler.lap('arena draw')
         if not self.game_over and self.camera_mode == 1:
-            self.player.draw()
-        for enemy in self.enemies:
-            enemy.draw()
-        for bullet in self.bullets:
-            bullet.draw()
-        for bullet in self.enemy_bullets:
-            bullet.draw()
-        for collectible in self.collectibles:
-            collectible.draw()
-        for power_up in self.power_ups:
-            power_up.draw()
+            self.player.draw(self.frustum)
+        frustum = self.frustum
+        for group in (self.enemies, self.bullets, self.enemy_bullets, self.collectibles, self.power_ups):
+            for obj in group:# Skip entities whose bounding sphere is outside the view before any GL call
+                if not obj.active:
+                    continue
+                position = obj.position
+                if frustum.sphere_visible(position.x, position.y, position.z, obj.bounding_radius()):
+                    obj.draw(frustum=frustum)
+                    drawn += 1
+                else:
+                    culled += 1
+        if self.bullet_arrays is not None:
+            bullets_drawn, bullets_culled = self.bullet_arrays.draw(frustum)
+            drawn += bullets_drawn
+            culled += bullets_culled
+        self.cull_stats = (drawn, culled)
+        profiler.lap('entity draw')
         self.draw_enhanced_hud()
+        profiler.lap('hud')
         glutSwapBuffers()
+        profiler.lap('swap')
 enhanced_game = None
+sim_clock = FixedTimestep()
 def init_opengl():# Initialize OpenGL settings
     glEnable(GL_DEPTH_TEST)
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
-    gluPerspective(75, WINDOW_WIDTH/WINDOW_HEIGHT, 0.1, 120.0)
+    gluPerspective(CAMERA_FOV, WINDOW_WIDTH/WINDOW_HEIGHT, CAMERA_NEAR, CAMERA_FAR)
     glMatrixMode(GL_MODELVIEW)
 def display():
     if enhanced_game:
         enhanced_game.draw()
-def update(value):
+def update(value):# Run as many fixed simulation steps as the elapsed time calls for
     if enhanced_game:
-        enhanced_game.handle_input()
-        enhanced_game.update()
+        for _ in range(sim_clock.advance()):
+            enhanced_game.handle_input()
+            enhanced_game.update()
     glutPostRedisplay()
-    glutTimerFunc(16, update, 0)
+    glutTimerFunc(TIMER_INTERVAL_MS, update, 0)
+def live_input():# Whether window input reaches the game; a running --replay owns the input until it ends
+    return enhanced_game is not None and enhanced_game.playback is None
+def save_recording():# Write --record's file; runs at exit, whichever way the window goes away
+    if enhanced_game and enhanced_game.recorder:
+        enhanced_game.recorder.save()
+def close_window():# freeglut exits from C after this, skipping Python's atexit handlers
+    save_recording()
 def keyboard(key, x, y):# Handle key press events
-    if enhanced_game:
+    if enhanced_game and key == b'\x1b':
+        stats = sim_clock.stats()
+        print(f"Simulation: {stats['steps']} steps over {stats['frames']} frames, "
+              f"{stats['merged_frames']} catch-up frames, {stats['dropped_steps']} steps dropped")
+        sys.exit()
+    if live_input():
         enhanced_game.keys.add(ord(key))
-        if key == b'x' or key == b'X':
-            bullets = enhanced_game.player.shoot()
-            if bullets:
-                for bullet in bullets:
-                    bullet.arena = enhanced_game.arena
-                enhanced_game.bullets.extend(bullets)
-        elif key == b'f' or key == b'F':
-            enhanced_game.fog_enabled = not enhanced_game.fog_enabled
-        elif key == b' ':
-            enhanced_game.player.jump()
-        elif key == b'r' or key == b'R':
-            enhanced_game.reset_game()
-        elif key == b'c' or key == b'C':
-            enhanced_game.camera_mode = (enhanced_game.camera_mode + 1) % 2
-        elif key == b'\x1b':
-            import sys
-            sys.exit()
+        enhanced_game.press_key(key)
 def keyboard_up(key, x, y):# Handle key release events
-    if enhanced_game:
+    if live_input():
         enhanced_game.keys.discard(ord(key))
 def special_keys(key, x, y):# Handle special key press events
-    if enhanced_game:
+    if live_input():
         enhanced_game.special_keys.add(key)
 def special_keys_up(key, x, y):# Handle special key release events
-    if enhanced_game:
+    if live_input():
         enhanced_game.special_keys.discard(key)
 def mouse_button(button, state, x, y):# Handle mouse button events
-    if enhanced_game:
+    if live_input():
         if state == GLUT_DOWN:
             enhanced_game.mouse_buttons.add(button)
-            if button == GLUT_LEFT_BUTTON and enhanced_game.camera_mode == 0:
-                bullets = enhanced_game.player.shoot()
-                if bullets:
-                    for bullet in bullets:
-                        bullet.arena = enhanced_game.arena
-                    enhanced_game.bullets.extend(bullets)
+            enhanced_game.press_mouse(button)
         else:
             enhanced_game.mouse_buttons.discard(button)
 def reshape(width, height):# Handle window resize events
@@ -1228,17 +2459,21 @@ def reshape(width, height):# Handle window resize events
     glViewport(0, 0, width, height)
     glMatrixMode(GL_PROJECTION)
     glLoadIdentity()
-    gluPerspective(75, width/height, 0.1, 120.0)
+    gluPerspective(CAMERA_FOV, width/height, CAMERA_NEAR, CAMERA_FAR)
     glMatrixMode(GL_MODELVIEW)
-def main():
+def main(args):
     global enhanced_game
+    if not HAS_OPENGL:
+        sys.exit("PyOpenGL is not installed; use --headless to run the simulation only")
     glutInit()
     glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
     glutInitWindowSize(WINDOW_WIDTH, WINDOW_HEIGHT)
     glutInitWindowPosition(150, 100)
     glutCreateWindow(b"Enhanced Arena Shooter - COMPLIANT VERSION")
     init_opengl()
-    enhanced_game = EnhancedGame()
+    enhanced_game = make_game(args)
+    enhanced_game.arena.use_instancing = not args.no_instancing
+    atexit.register(save_recording)
     glutDisplayFunc(display)
     glutKeyboardFunc(keyboard)
     try:
@@ -1246,10 +2481,617 @@ def main():
         glutSpecialUpFunc(special_keys_up)
     except:
         pass
+    try:# freeglut only
+        glutCloseFunc(close_window)
+    except:
+        pass
     glutSpecialFunc(special_keys)
     glutMouseFunc(mouse_button)
     glutReshapeFunc(reshape)
-    glutTimerFunc(16, update, 0)
+    sim_clock.reset()
+    glutTimerFunc(TIMER_INTERVAL_MS, update, 0)
     glutMainLoop()
+def patrol_script(game, tick):# Scripted input for headless runs: walk, turn, strafe and fire in a loop
+    phase = (tick // 120) % 4
+    game.keys = {ord('w')} if phase != 2 else {ord('a')}
+    game.special_keys = {GLUT_KEY_RIGHT} if phase == 1 else set()
+    game.mouse_buttons = {GLUT_LEFT_BUTTON}
+    if tick % 240 == 0:
+        game.press_key(b' ')
+def bot_script(game, tick):# Greedy bot for batch runs: shoot the nearest enemy in sight, else walk to the nearest pickup
+    position = game.player.position
+    game.camera_mode = 0
+    game.target_angle_x = 0
+    game.special_keys = set()
+    def distance_sq(obj):
+        return (obj.position.x - position.x) ** 2 + (obj.position.z - position.z) ** 2
+    target, shooting = None, False
+    if game.enemies:
+        enemy = min(game.enemies, key=distance_sq)
+        if game.arena.line_of_sight(position.x, position.z, enemy.position.x, enemy.position.z):
+            target, shooting = enemy.position, True
+    pickups = game.collectibles + game.power_ups
+    if target is None and pickups:
+        target = min(pickups, key=distance_sq).position
+    if target is not None:# Aim (and so walk) straight at it, turning the short way round
+        yaw = math.degrees(math.atan2(position.x - target.x, position.z - target.z))
+        game.target_angle_y = game.camera_angle_y + (yaw - game.camera_angle_y + 180) % 360 - 180
+    if shooting:
+        game.keys = {ord('a') if tick // 60 % 2 else ord('d')}# Strafe while firing
+        game.mouse_buttons = {GLUT_LEFT_BUTTON}
+    else:
+        game.keys = {ord('w')}
+        game.mouse_buttons = set()
+    if tick % 180 == 0:
+        game.press_key(b' ')
+BATCH_SCRIPTS = {'bot': bot_script, 'patrol': patrol_script}
+def make_game(args):# Build a game honouring --seed, --record and --replay; a replay takes its settings from the recording
+    playback = InputPlayback.load(args.replay) if args.replay else None
+    seed = playback.seed if playback else args.seed
+    if seed is None and args.record:
+        seed = random.randrange(2**31)
+    settings = {name: getattr(args, name) for name in REPLAY_SETTINGS}
+    if playback:
+        for name, value in playback.settings.items():
+            if settings[name] not in (value, REPLAY_SETTINGS[name]):
+                sys.exit(f"{args.replay} was recorded with {name}={value}, "
+                         f"which conflicts with --{name.replace('_', '-')} {settings[name]}")
+            settings[name] = value
+        if settings['numpy_bullets'] and np is None:
+            sys.exit(f"{args.replay} was recorded with the NumPy bullet engine, but NumPy is not installed")
+    game = EnhancedGame(seed, vectorized_bullets=settings['numpy_bullets'], max_bullets=settings['max_bullets'],
+                        arena_size=settings['arena_size'])
+    game.playback = playback
+    if args.record:
+        settings['numpy_bullets'] = game.bullet_arrays is not None# What actually ran, should NumPy be missing
+        game.recorder = InputRecorder(seed, args.record, settings)
+    return game
+def run_headless(ticks, script=patrol_script, game=None, restart=True):# Step the simulation with no window or GL context
+    if game is None:
+        game = EnhancedGame()
+    if game.playback:# Resets only come from the recorded R presses, exactly as they happened live
+        script = None
+        ticks = game.playback.ticks
+        restart = False
+    start = time.perf_counter()
+    for tick in range(ticks):
+        if restart and (game.game_over or game.victory):
+            game.press_key(b'r')# Through press_key so a recording captures the restart
+        if script:
+            script(game, tick)
+        game.handle_input()
+        game.update()
+    elapsed = time.perf_counter() - start
+    return {
+        'ticks': ticks,
+        'seconds': elapsed,
+        'ticks_per_sec': ticks / elapsed if elapsed > 0 else float('inf'),
+        'games': game.games_played,
+        'score': game.score,
+        'seed': game.seed,
+        'bullets': game.bullet_stats(),
+        'spawn_failures': game.spawn_failures,
+    }
+BENCH_SCENARIOS = {# name -> bench_game settings; each is held at this load for the whole run
+    '4_enemies': {'enemies': 4},
+    '12_enemies_boss': {'enemies': 12, 'boss': True},
+    'rapid_fire_500_bullets': {'enemies': 4, 'bullets': 500, 'rapid_fire': True},
+    'arena_128': {'enemies': 12, 'arena_size': 128},
+    'arena_512': {'enemies': 12, 'arena_size': 512},
+}
+BENCH_SCALING = {# Parameter swept for each scaling curve, with the settings it is layered on
+    'enemies': ((4, 8, 16, 32, 64), {}),
+    'bullets': ((0, 100, 250, 500, 1000), {'enemies': 4}),
+    'arena_size': ((22, 64, 128, 256, 512), {'enemies': 12}),
+}
+def bench_game(seed, vectorized=False, enemies=0, boss=False, bullets=0, arena_size=ARENA_SIZE, rapid_fire=False):
+    game = EnhancedGame(seed, vectorized_bullets=vectorized, max_bullets=max(MAX_BULLETS, bullets * 2),
+                        arena_size=arena_size)
+    game.enemies = []
+    def hold(game, tick):# Keep the scenario's load steady: no deaths, no victory, a constant population
+        patrol_script(game, tick)
+        game.player.health = game.player.max_health
+        game.score = 0
+        if rapid_fire:# The power-up's shorter cooldown, so the player's own fire path runs at its fastest
+            game.player.rapid_fire_time = game.tuning['power_up_ticks']['rapid_fire']
+        if len(game.enemies) < enemies:
+            game.spawn_enemies(enemies - len(game.enemies))
+        if boss and not game.boss_active:
+            game.spawn_boss()
+        live = len(game.bullets) + (game.bullet_arrays.count if game.bullet_arrays is not None else 0)
+        position = game.player.position
+        for i in range(bullets - live):# Fan replacements out around the player at the golden angle
+            angle = (tick * bullets + i) * 2.399963
+            bullet = game.bullet_pool.acquire(Vector3(position.x, position.y + 0.4, position.z),
+                                              Vector3(math.sin(angle), 0, math.cos(angle)), 0.5, True)
+            if bullet is None:
+                break
+            game.track_bullets([bullet])
+    return game, hold
+def bench_run(ticks, seed, vectorized=False, warmup=60, **settings):# Ticks/sec and per-phase ms for one setting
+    game, hold = bench_game(seed, vectorized, **settings)
+    for tick in range(warmup):
+        hold(game, tick)
+        game.handle_input()
+        game.update()
+    game.profiler = FrameProfiler(ticks)
+    game.profiler.enabled = True
+    elapsed = 0.0
+    for tick in range(warmup, warmup + ticks):
+        hold(game, tick)
+        start = time.perf_counter()
+        game.handle_input()
+        game.update()
+        elapsed += time.perf_counter() - start
+    return {
+        'ticks': ticks,
+        'ticks_per_sec': ticks / elapsed if elapsed > 0 else float('inf'),
+        'phases_ms': {name: round(average, 4) for name, (average, _) in game.profiler.stats().items()},
+        'enemies': len(game.enemies),
+        'bullets': len(game.bullets) + len(game.enemy_bullets) + (game.bullet_arrays.count if game.bullet_arrays is not None else 0),
+    }
+def run_bench(ticks, seed=1, vectorized=False, curves=True):# Every scenario plus the scaling sweeps
+    results = {'ticks': ticks, 'seed': seed, 'vectorized_bullets': vectorized, 'scenarios': {}, 'scaling': {}}
+    for name, settings in BENCH_SCENARIOS.items():
+        results['scenarios'][name] = bench_run(ticks, seed, vectorized, **settings)
+    if curves:
+        for parameter, (values, base) in BENCH_SCALING.items():
+            results['scaling'][parameter] = [
+                [value, round(bench_run(max(ticks // 2, 1), seed, vectorized, **dict(base, **{parameter: value}))
+                              ['ticks_per_sec'], 1)]
+                for value in values]
+    return results
+def bench_regressions(results, baseline, tolerance):# Scenarios that got slower than the baseline allows
+    regressions = []
+    for name, result in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous and result['ticks_per_sec'] < previous['ticks_per_sec'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['ticks_per_sec']:.0f} ticks/sec, "
+                               f"baseline {previous['ticks_per_sec']:.0f} (-{tolerance:.0%} allowed)")
+    return regressions
+class GLCounter:# Wraps the module's gl*/glu*/glut* names to count calls and triangles submitted per frame
+    PRIMITIVES = ('GL_TRIANGLES', 'GL_QUADS', 'GL_TRIANGLE_STRIP', 'GL_TRIANGLE_FAN', 'GL_QUAD_STRIP', 'GL_POLYGON')
+    def __init__(self):
+        self.originals = {}
+        self.calls = 0
+        self.by_name = {}
+        self.triangles = 0
+        self.list_triangles = {}# Display lists remember what they compiled, glCallList replays it
+        self.recording = None
+        self.begin_mode = None
+        self.vertices = 0
+        self.primitives = {globals()[name]: name for name in self.PRIMITIVES if name in globals()}
+    def install(self, namespace):
+        for name, function in list(namespace.items()):# Null entry points stay unwrapped so capability checks see them
+            if name.startswith('gl') and callable(function) and function:
+                self.originals[name] = function
+                namespace[name] = self.wrap(name, function)
+    def uninstall(self, namespace):
+        namespace.update(self.originals)
+        self.originals = {}
+    def wrap(self, name, function):
+        hook = getattr(self, 'on_' + name, None)
+        if name.startswith('glVertex'):
+            hook = self.on_vertex
+        def counted(*args):
+            self.calls += 1
+            self.by_name[name] = self.by_name.get(name, 0) + 1
+            if hook:
+                hook(*args)
+            return function(*args)
+        return counted
+    def frame(self):# (calls, triangles, calls by name) since the previous frame
+        counts = (self.calls, self.triangles, self.by_name)
+        self.calls = 0
+        self.triangles = 0
+        self.by_name = {}
+        return counts
+    def add_triangles(self, count):
+        if self.recording is not None:
+            self.list_triangles[self.recording] += count
+        else:
+            self.triangles += count
+    def on_vertex(self, *args):
+        self.vertices += 1
+    def on_glBegin(self, mode):
+        self.begin_mode = mode
+        self.vertices = 0
+    def mode_triangles(self, mode, vertices):# Triangles rasterized for vertices drawn as mode (0 for points, lines)
+        kind = self.primitives.get(mode)
+        if kind == 'GL_TRIANGLES':
+            return vertices // 3
+        if kind == 'GL_QUADS':
+            return vertices // 4 * 2
+        if kind:# Strips, fans and polygons: one triangle per vertex after the first two
+            return max(vertices - 2, 0)
+        return 0
+    def on_glEnd(self):
+        self.add_triangles(self.mode_triangles(self.begin_mode, self.vertices))
+    def on_glNewList(self, display_list, mode):
+        self.recording = display_list
+        self.list_triangles[display_list] = 0
+    def on_glEndList(self):
+        self.recording = None
+    def on_glCallList(self, display_list):
+        self.add_triangles(self.list_triangles.get(display_list, 0))
+    def on_glutSolidSphere(self, radius, slices, stacks):
+        self.add_triangles(2 * slices * (stacks - 1))
+    def on_glutSolidCube(self, size):
+        self.add_triangles(12)
+    def on_glDrawArrays(self, mode, first, count):
+        self.add_triangles(self.mode_triangles(mode, count))
+    def on_glDrawArraysInstanced(self, mode, first, count, instances):
+        self.add_triangles(self.mode_triangles(mode, count) * instances)
+def percentile(values, fraction):# Nearest-rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+def start_virtual_display():# Xvfb for machines with no screen; returns the server process, or None if there is a DISPLAY
+    if os.environ.get('DISPLAY'):
+        return None
+    import shutil
+    import subprocess
+    if shutil.which('Xvfb') is None:
+        sys.exit("--render-bench needs a DISPLAY or Xvfb on the PATH")
+    number = 90 + os.getpid() % 100
+    server = subprocess.Popen(['Xvfb', f':{number}', '-screen', '0', f'{WINDOW_WIDTH}x{WINDOW_HEIGHT}x24', '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while not os.path.exists(f'/tmp/.X11-unix/X{number}'):
+        if server.poll() is not None or time.time() > deadline:
+            server.kill()
+            sys.exit(f"Xvfb failed to start on :{number}")
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = f':{number}'
+    return server
+def run_render_bench(frames, seed=1, vectorized=False, instancing=True, warmup_ticks=300, count_frames=20):
+    # Mesa's llvmpipe rasterizer is forced so the figures are CPU-bound and comparable between machines
+    if not HAS_OPENGL:
+        sys.exit("PyOpenGL is not installed; --render-bench needs it")
+    os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+    os.environ.setdefault('GALLIUM_DRIVER', 'llvmpipe')
+    server = start_virtual_display()
+    # The counter watches from before the first display list is compiled (meshes, chunk floors, HUD, glyph
+    # atlas) so glCallList can replay their triangle counts; it is only lifted while frames are timed
+    counter = GLCounter()
+    counter.install(globals())
+    try:
+        glutInit()
+        glutInitDisplayMode(GLUT_DOUBLE | GLUT_RGB | GLUT_DEPTH)
+        glutInitWindowSize(WINDOW_WIDTH, WINDOW_HEIGHT)
+        glutCreateWindow(b"Render benchmark")
+        init_opengl()
+        game, hold = bench_game(seed, vectorized, enemies=12, boss=True, bullets=200)
+        game.arena.use_instancing = instancing
+        for tick in range(warmup_ticks):# A busy but frozen scene: the same frame is drawn every time
+            hold(game, tick)
+            game.handle_input()
+            game.update()
+        renderer = glGetString(GL_RENDERER)
+        results = {'renderer': renderer.decode() if isinstance(renderer, bytes) else str(renderer),
+                   'frames': frames, 'seed': seed, 'instancing': instancing, 'modes': {}}
+        for mode, name in ((0, 'first_person'), (1, 'top_down')):
+            game.camera_mode = mode
+            for _ in range(10):# Compile display lists, the glyph atlas and mesh caches before timing
+                game.draw()
+            glFinish()
+            counter.uninstall(globals())# Timed without the wrappers so they don't inflate the frame times
+            times = []
+            for _ in range(frames):
+                start = time.perf_counter()
+                game.draw()
+                glFinish()
+                times.append((time.perf_counter() - start) * 1000)
+            counter.install(globals())
+            counter.frame()# Drop whatever the warmup frames submitted
+            calls, triangles, by_name = 0, 0, {}
+            for _ in range(count_frames):
+                game.draw()
+                frame_calls, frame_triangles, frame_by_name = counter.frame()
+                calls += frame_calls
+                triangles += frame_triangles
+                for call, count in frame_by_name.items():
+                    by_name[call] = by_name.get(call, 0) + count
+            busiest = sorted(by_name.items(), key=lambda item: -item[1])[:10]
+            results['modes'][name] = {
+                'frame_ms': {'p50': percentile(times, 0.5), 'p90': percentile(times, 0.9),
+                             'p99': percentile(times, 0.99), 'max': max(times), 'mean': sum(times) / len(times)},
+                'gl_calls_per_frame': calls / count_frames,
+                'triangles_per_frame': triangles / count_frames,
+                'top_gl_calls': {call: count / count_frames for call, count in busiest},
+                'drawn_culled': list(game.cull_stats),
+            }
+        return results
+    finally:
+        counter.uninstall(globals())
+        if server:
+            server.terminate()
+def simulate_game(job):# One seeded game played to victory, death or the tick limit; runs inside a batch worker
+    seed, max_ticks, settings = job
+    script = BATCH_SCRIPTS[settings['script']]
+    game = EnhancedGame(seed, vectorized_bullets=settings['vectorized'], arena_size=settings['arena_size'],
+                        tuning=settings['tuning'])
+    sample_every = settings['sample_every']
+    score_curve = []
+    bosses = 0
+    boss_active = game.boss_active
+    start = time.perf_counter()
+    tick = 0
+    while tick < max_ticks and not (game.game_over or game.victory):
+        script(game, tick)
+        game.handle_input()
+        game.update()
+        tick += 1
+        if game.boss_active and not boss_active:
+            bosses += 1
+        boss_active = game.boss_active
+        if tick % sample_every == 0:
+            score_curve.append(game.score)
+    return {
+        'seed': seed,
+        'outcome': 'victory' if game.victory else 'death' if game.game_over else 'timeout',
+        'ticks': tick,
+        'score': game.score,
+        'health': game.player.health,
+        'bosses': bosses,
+        'spawn_failures': game.spawn_failures,
+        'score_curve': score_curve,
+        'seconds': time.perf_counter() - start,
+    }
+def distribution(values):# Mean and percentiles of a list, or None when it is empty
+    if not values:
+        return None
+    return {'mean': sum(values) / len(values), 'p10': percentile(values, 0.1), 'p50': percentile(values, 0.5),
+            'p90': percentile(values, 0.9)}
+def batch_summary(results, seconds, workers, sample_every):# Aggregate outcome statistics over finished games
+    outcomes = {'victory': 0, 'death': 0, 'timeout': 0}
+    for result in results:
+        outcomes[result['outcome']] += 1
+    samples = max((len(result['score_curve']) for result in results), default=0)
+    score_curve = []
+    for index in range(samples):# Finished games keep contributing their final score
+        total = sum(result['score_curve'][index] if index < len(result['score_curve']) else result['score']
+                    for result in results)
+        score_curve.append([(index + 1) * sample_every, total / len(results)])
+    ticks = sum(result['ticks'] for result in results)
+    return {
+        'games': len(results),
+        'workers': workers,
+        'seconds': seconds,
+        'games_per_sec': len(results) / seconds if seconds > 0 else float('inf'),
+        'ticks_per_sec': ticks / seconds if seconds > 0 else float('inf'),
+        'outcomes': outcomes,
+        'victory_rate': outcomes['victory'] / len(results) if results else 0.0,
+        'ticks_to_victory': distribution([r['ticks'] for r in results if r['outcome'] == 'victory']),
+        'ticks_to_death': distribution([r['ticks'] for r in results if r['outcome'] == 'death']),
+        'score': distribution([result['score'] for result in results]),
+        'bosses_per_game': sum(result['bosses'] for result in results) / len(results) if results else 0.0,
+        'score_curve': score_curve,
+    }
+def run_batch(games, max_ticks, seed=1, workers=None, out=None, script='bot', tuning=None, vectorized=False,
+              arena_size=ARENA_SIZE, sample_every=600):
+    # Games share nothing, so they fan out one per task across a process pool and scale with the cores.
+    # Each result is appended to out as a JSON line the moment its game finishes, in completion order.
+    import multiprocessing
+    merge_tuning(tuning)# Reject a bad tuning here rather than once per worker
+    settings = {'script': script, 'tuning': tuning, 'vectorized': vectorized, 'arena_size': arena_size,
+                'sample_every': sample_every}
+    jobs = [(seed + i, max_ticks, settings) for i in range(games)]
+    workers = workers or os.cpu_count() or 1
+    results = []
+    start = time.perf_counter()
+    stream = open(out, 'w') if out else None
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        finished = pool.imap_unordered(simulate_game, jobs) if pool else map(simulate_game, jobs)
+        for result in finished:
+            results.append(result)
+            if stream:
+                stream.write(json.dumps(result) + '\n')
+                stream.flush()
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        if stream:
+            stream.close()
+    return batch_summary(results, time.perf_counter() - start, workers, sample_every)
+def slot_names(cls):# Every __slots__ attribute declared along the class hierarchy
+    names = []
+    for klass in reversed(cls.__mro__):
+        names.extend(klass.__dict__.get('__slots__', ()))
+    return names
+def run_microbench(count=50000):# Memory and time per entity: __slots__ layout against the old __dict__ layout
+    import timeit
+    import tracemalloc
+    class DictVector3:
+        def __init__(self, x=0, y=0, z=0):
+            self.x, self.y, self.z = x, y, z
+        def __add__(self, other):
+            return DictVector3(self.x + other.x, self.y + other.y, self.z + other.z)
+        def normalize(self):
+            length = math.sqrt(self.x**2 + self.y**2 + self.z**2)
+            return DictVector3(self.x/length, self.y/length, self.z/length)
+    class DictEntity:
+        pass
+    def as_dict_entity(entity):# Same attributes stored in a per-instance __dict__
+        twin = DictEntity()
+        for name in slot_names(type(entity)):
+            value = getattr(entity, name)
+            if isinstance(value, Vector3):
+                value = DictVector3(value.x, value.y, value.z)
+            setattr(twin, name, value)
+        return twin
+    def bytes_per_item(factory):
+        items = [factory() for _ in range(100)]# Warm up any lazily created shared state first
+        tracemalloc.start()
+        items = [factory() for _ in range(count)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del items
+        return size / count
+    entities = [
+        ('Vector3', lambda: Vector3(1.0, 2.0, 3.0), lambda: DictVector3(1.0, 2.0, 3.0)),
+        ('EnhancedBullet', lambda: EnhancedBullet(Vector3(), Vector3(0, 0, 1)),
+         lambda: as_dict_entity(EnhancedBullet(Vector3(), Vector3(0, 0, 1)))),
+        ('Enemy', lambda: Enemy(Vector3(1.0, 1.0, 1.0)), lambda: as_dict_entity(Enemy(Vector3(1.0, 1.0, 1.0)))),
+        ('Collectible', lambda: Collectible(Vector3()), lambda: as_dict_entity(Collectible(Vector3()))),
+        ('PowerUp', lambda: PowerUp(Vector3(), "speed"), lambda: as_dict_entity(PowerUp(Vector3(), "speed"))),
+    ]
+    print(f"{'entity':<16}{'__dict__ B':>12}{'__slots__ B':>13}{'saved':>8}")
+    for name, slotted, dicted in entities:
+        slots_size = bytes_per_item(slotted)
+        dict_size = bytes_per_item(dicted)
+        print(f"{name:<16}{dict_size:>12.0f}{slots_size:>13.0f}{1 - slots_size / dict_size:>8.0%}")
+    number = 200000
+    velocity, acceleration = Vector3(0.1, 0.0, 0.1), Vector3(0.001, 0.0, 0.001)
+    dict_velocity, dict_acceleration = DictVector3(0.1, 0.0, 0.1), DictVector3(0.001, 0.0, 0.001)
+    def dict_add():
+        nonlocal dict_velocity
+        dict_velocity = dict_velocity + dict_acceleration
+    def slots_iadd():
+        nonlocal velocity
+        velocity += acceleration
+    timings = [
+        ('v = v + a', dict_add, slots_iadd),
+        ('normalize', lambda: dict_velocity.normalize(), lambda: velocity.normalize_ip()),
+        ('read x, y, z', lambda: dict_velocity.x + dict_velocity.y + dict_velocity.z,
+         lambda: velocity.x + velocity.y + velocity.z),
+    ]
+    print(f"{'operation':<16}{'__dict__ ns':>12}{'__slots__ ns':>13}{'saved':>8}")
+    for name, dicted, slotted in timings:
+        dict_time = min(timeit.repeat(dicted, number=number, repeat=3)) / number * 1e9
+        slots_time = min(timeit.repeat(slotted, number=number, repeat=3)) / number * 1e9
+        print(f"{name:<16}{dict_time:>12.0f}{slots_time:>13.0f}{1 - slots_time / dict_time:>8.0%}")
+def expect(condition, message):# Check failure that survives python -O, unlike assert
+    if not condition:
+        raise AssertionError(message)
+def check_arena_sizes():# Odd and even sizes generate, and every lookup agrees with the stored layout
+    for size in (MIN_ARENA_SIZE, 13, ARENA_SIZE, 23, 63, 100):
+        arena = Arena(random.Random(size), size)
+        expect(len(arena.state_rows) == size and all(len(row) == size for row in arena.state_rows),
+               f"size {size}: generated {len(arena.state_rows)} rows")
+        for tile_x in range(size):
+            for tile_z in range(size):
+                x, z = tile_x - arena.half + 0.5, tile_z - arena.half + 0.5
+                expect(arena.get_tile_at(x, z) == arena.state_rows[tile_x][tile_z],
+                       f"size {size}: lookup at ({x}, {z}) disagrees with tile ({tile_x}, {tile_z})")
+        expect(all(arena.get_tile_at(x + 0.5, z + 0.5) == 0 for x in range(-3, 4) for z in range(-3, 4)),
+               f"size {size}: spawn area around the origin is not clear")
+def record_and_replay(ticks, flags):# (recorded, replayed) run_headless results; the replay gets only --replay
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'replay.json')
+        game = make_game(parse_args(flags + ['--record', path]))
+        recorded = run_headless(ticks, game=game)
+        game.recorder.save()
+        replayed = run_headless(0, game=make_game(parse_args(['--replay', path])))
+    for key in ('ticks', 'games', 'score'):
+        expect(replayed[key] == recorded[key], f"{flags}: {key} recorded {recorded[key]}, replayed {replayed[key]}")
+    return recorded, replayed
+def check_replay_round_trip():# Multi-game and non-default-arena recordings replay to the same score and games count
+    recorded, _ = record_and_replay(8000, ['--seed', '7'])
+    expect(recorded['games'] > 1, f"recording covered {recorded['games']} game, restarts went untested")
+    record_and_replay(3000, ['--seed', '11', '--arena-size', '40', '--max-bullets', '64'])
+SELF_CHECKS = {# name -> function that raises on failure; run with --check
+    'arena_sizes': check_arena_sizes,
+    'replay_round_trip': check_replay_round_trip,
+}
+def run_checks():# Run every self-check; returns the number that failed
+    failures = 0
+    for name, check in SELF_CHECKS.items():
+        try:
+            check()
+            print(f"ok    {name}")
+        except Exception as error:# A crash inside a check is a failure too, not the end of the run
+            failures += 1
+            print(f"FAIL  {name}: {type(error).__name__}: {error}")
+    return failures
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Escape The Grid")
+    parser.add_argument('--headless', action='store_true', help="run the simulation without a window")
+    parser.add_argument('--microbench', action='store_true', help="compare __slots__ and __dict__ entity layouts")
+    parser.add_argument('--check', action='store_true', help="run the built-in consistency checks")
+    parser.add_argument('--ticks', type=int, default=10000, help="simulation ticks for --headless")
+    parser.add_argument('--seed', type=int, default=None, help="seed the game's random number generator")
+    parser.add_argument('--numpy-bullets', action='store_true', help="use the vectorized NumPy bullet engine")
+    parser.add_argument('--max-bullets', type=int, default=MAX_BULLETS, help="bullet pool capacity")
+    parser.add_argument('--no-instancing', action='store_true', help="draw tiles with display lists instead")
+    parser.add_argument('--record', metavar='FILE', help="record per-tick input to FILE")
+    parser.add_argument('--replay', metavar='FILE', help="replay input recorded with --record")
+    parser.add_argument('--arena-size', type=int, default=ARENA_SIZE,
+                        help=f"tiles along each side of the arena ({MIN_ARENA_SIZE}-{MAX_ARENA_SIZE})")
+    parser.add_argument('--bench', action='store_true', help="run the headless benchmark scenarios, JSON to stdout")
+    parser.add_argument('--bench-ticks', type=int, default=600, help="timed ticks per benchmark scenario")
+    parser.add_argument('--bench-out', metavar='FILE', help="also write --bench/--render-bench JSON to FILE")
+    parser.add_argument('--bench-baseline', metavar='FILE', help="fail if a scenario is slower than in FILE")
+    parser.add_argument('--bench-tolerance', type=float, default=0.2, help="allowed slowdown against the baseline")
+    parser.add_argument('--no-curves', action='store_true', help="skip the benchmark scaling sweeps")
+    parser.add_argument('--render-bench', action='store_true',
+                        help="time EnhancedGame.draw on a software GL context (Xvfb + llvmpipe when headless)")
+    parser.add_argument('--render-frames', type=int, default=300, help="timed frames per camera mode for --render-bench")
+    parser.add_argument('--batch', type=int, metavar='GAMES', help="play GAMES seeded headless games across a process pool")
+    parser.add_argument('--batch-ticks', type=int, default=36000, help="tick limit per --batch game")
+    parser.add_argument('--batch-script', choices=sorted(BATCH_SCRIPTS), default='bot', help="input driver for --batch")
+    parser.add_argument('--batch-out', metavar='FILE', help="stream per-game --batch results to FILE as JSON lines")
+    parser.add_argument('--workers', type=int, default=None, help="--batch processes (default: one per core)")
+    parser.add_argument('--tuning', metavar='FILE', help="JSON object overriding DEFAULT_TUNING keys for --batch")
+    args = parser.parse_args(argv)
+    if not MIN_ARENA_SIZE <= args.arena_size <= MAX_ARENA_SIZE:
+        parser.error(f"--arena-size must be between {MIN_ARENA_SIZE} and {MAX_ARENA_SIZE}")
+    if args.max_bullets < 1:
+        parser.error("--max-bullets must be at least 1")
+    if args.tuning and args.batch is None:# Other modes build default-tuned games; don't let an override look active
+        parser.error("--tuning only applies to --batch")
+    return args
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args(sys.argv[1:])
+    if args.microbench:
+        run_microbench()
+    elif args.check:
+        sys.exit(1 if run_checks() else 0)
+    elif args.render_bench:
+        results = run_render_bench(args.render_frames, 1 if args.seed is None else args.seed, args.numpy_bullets,
+                                   not args.no_instancing)
+        if args.bench_out:
+            with open(args.bench_out, 'w') as f:
+                json.dump(results, f, indent=2)
+        print(json.dumps(results, indent=2))
+    elif args.batch:
+        tuning = None
+        if args.tuning:
+            with open(args.tuning) as f:
+                tuning = json.load(f)
+        try:
+            merge_tuning(tuning)
+        except ValueError as error:
+            sys.exit(f"--tuning {args.tuning}: {error}")
+        summary = run_batch(args.batch, args.batch_ticks, 1 if args.seed is None else args.seed, args.workers,
+                            args.batch_out, args.batch_script, tuning, args.numpy_bullets, args.arena_size)
+        print(json.dumps(summary, indent=2))
+    elif args.bench:
+        results = run_bench(args.bench_ticks, 1 if args.seed is None else args.seed, args.numpy_bullets,
+                            not args.no_curves)
+        if args.bench_out:
+            with open(args.bench_out, 'w') as f:
+                json.dump(results, f, indent=2)
+        print(json.dumps(results, indent=2))
+        if args.bench_baseline:
+            with open(args.bench_baseline) as f:
+                regressions = bench_regressions(results, json.load(f), args.bench_tolerance)
+            for regression in regressions:
+                print(f"REGRESSION {regression}", file=sys.stderr)
+            if regressions:
+                sys.exit(1)
+    elif args.headless:
+        game = make_game(args)
+        result = run_headless(args.ticks, game=game)
+        if game.recorder:
+            game.recorder.save()
+        print(f"{result['ticks']} ticks in {result['seconds']:.2f}s "
+              f"({result['ticks_per_sec']:.0f} ticks/sec, {result['games']} games, "
+              f"seed {result['seed']}, final score {result['score']})")
+        bullets = result['bullets']
+        print(f"Bullet {bullets['engine']}: {bullets['in_use']}/{bullets['capacity']} in use, "
+              f"high water {bullets['high_water']}, {bullets['rejected']} shots rejected")
+    else:
+        main(args)
\ No newline at end of file